@@ -1,10 +1,12 @@
 from django.contrib import admin
-from .models import City, WeatherData, SearchHistory, Favorite
+from .models import (
+    City, WeatherData, LatestWeather, HourlyWeatherRollup, DailyWeatherRollup, SearchHistory, Favorite
+)
 
 
 @admin.register(City)
 class CityAdmin(admin.ModelAdmin):
-    list_display = ('name', 'country', 'created_at')
+    list_display = ('name', 'country', 'created_at', 'last_searched_at')
     search_fields = ('name', 'country')
     list_filter = ('created_at',)
     ordering = ('-created_at',)
@@ -19,6 +21,22 @@ class WeatherDataAdmin(admin.ModelAdmin):
     readonly_fields = ('timestamp',)
 
 
+@admin.register(LatestWeather)
+class LatestWeatherAdmin(admin.ModelAdmin):
+    list_display = ('city', 'temperature', 'weather_main', 'observed_at')
+    search_fields = ('city__name',)
+    ordering = ('-observed_at',)
+    readonly_fields = ('observed_at',)
+
+
+@admin.register(HourlyWeatherRollup, DailyWeatherRollup)
+class WeatherRollupAdmin(admin.ModelAdmin):
+    list_display = ('city', 'bucket', 'count', 'temp_min', 'temp_max', 'weather_main')
+    search_fields = ('city__name',)
+    list_filter = ('weather_main',)
+    ordering = ('-bucket',)
+
+
 @admin.register(SearchHistory)
 class SearchHistoryAdmin(admin.ModelAdmin):
     list_display = ('city', 'searched_at')
@@ -0,0 +1,111 @@
+"""
+Read-only JSON API (mounted under /api/v1/).
+
+Everything here is served from the database and the upstream cache; a
+request never waits on OpenWeatherMap. Cities without a cached forecast get
+an empty one (``cached: false``); the pages and the scheduler fill the cache.
+"""
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .cache import cached_json_many
+from .models import City, LatestWeather, WeatherData
+from .serializers import CurrentWeatherSerializer, ForecastSerializer, WeatherHistorySerializer
+from .views import LOCATION_FIELDS, forecast_params, parse_forecast
+
+# Upper bound on ?ids= for the bulk endpoints
+MAX_BULK_CITIES = 200
+
+
+def parse_city_ids(request):
+    """City ids from ?ids=1,2,3 (de-duplicated, order kept)"""
+    try:
+        city_ids = [int(city_id) for city_id in request.query_params.get('ids', '').split(',') if city_id]
+    except ValueError:
+        raise ValidationError({'ids': 'Expected a comma-separated list of city ids'})
+    if not city_ids:
+        raise ValidationError({'ids': 'This parameter is required'})
+    if len(city_ids) > MAX_BULK_CITIES:
+        raise ValidationError({'ids': f'At most {MAX_BULK_CITIES} ids per request'})
+    return list(dict.fromkeys(city_ids))
+
+
+def cached_forecasts(cities):
+    """
+    Parsed forecasts per city id for the cities whose forecast is cached,
+    from one cache lookup. Misses are left out; nothing is fetched.
+    """
+    hits = cached_json_many('forecast', {city.id: forecast_params(city) for city in cities})
+    return {city_id: parse_forecast(data) for city_id, data in hits.items() if 'list' in data}
+
+
+def forecast_payload(city_id, forecast):
+    payload = ForecastSerializer(forecast or {'daily': [], 'hourly': []}).data
+    return {'city': city_id, 'cached': forecast is not None, **payload}
+
+
+class CurrentWeatherAPIView(RetrieveAPIView):
+    """Latest observation of one city; 404 if it was never observed"""
+    queryset = LatestWeather.objects.select_related('city')
+    serializer_class = CurrentWeatherSerializer
+    lookup_field = 'city_id'
+    lookup_url_kwarg = 'pk'
+
+
+class BulkCurrentWeatherAPIView(APIView):
+    """Latest observations of ?ids=1,2,3 in one query"""
+
+    def get(self, request):
+        city_ids = parse_city_ids(request)
+        latest = LatestWeather.objects.filter(city_id__in=city_ids).select_related('city')
+        results = {observation.city_id: CurrentWeatherSerializer(observation).data for observation in latest}
+        return Response({
+            'results': results,
+            'missing': [city_id for city_id in city_ids if city_id not in results],
+        })
+
+
+class ForecastAPIView(APIView):
+    """Cached daily and hourly forecast of one city"""
+
+    def get(self, request, pk):
+        city = City.objects.filter(pk=pk).only('id', *LOCATION_FIELDS).first()
+        if city is None:
+            raise NotFound()
+        return Response(forecast_payload(city.id, cached_forecasts([city]).get(city.id)))
+
+
+class BulkForecastAPIView(APIView):
+    """Cached forecasts of ?ids=1,2,3 in one cache lookup"""
+
+    def get(self, request):
+        city_ids = parse_city_ids(request)
+        cities = City.objects.filter(id__in=city_ids).only('id', *LOCATION_FIELDS)
+        forecasts = cached_forecasts(cities)
+        results = {city.id: forecast_payload(city.id, forecasts.get(city.id)) for city in cities}
+        return Response({
+            'results': results,
+            'missing': [city_id for city_id in city_ids if city_id not in results],
+        })
+
+
+class HistoryPagination(CursorPagination):
+    """Keyset pagination on the (city, -timestamp) index; no COUNT or OFFSET"""
+    ordering = ('-timestamp', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class WeatherHistoryAPIView(ListAPIView):
+    """Stored observations of one city, newest first"""
+    serializer_class = WeatherHistorySerializer
+    pagination_class = HistoryPagination
+
+    def get_queryset(self):
+        if not City.objects.filter(pk=self.kwargs['pk']).exists():
+            raise NotFound()
+        return WeatherData.objects.filter(city_id=self.kwargs['pk'])
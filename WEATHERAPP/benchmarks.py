@@ -0,0 +1,140 @@
+"""
+Micro-benchmarks for the page-building hot path (see the benchmark command).
+
+Every case runs on the fixed payloads in benchmark_data/ (recorded from the
+fake upstream, so results are comparable between commits) and never touches
+the network or the database. Upstream responses are served from the
+'weather' cache, as they are for most page views.
+"""
+import json
+import statistics
+import timeit
+from pathlib import Path
+
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.utils import timezone
+
+from .cache import WEATHER_CACHE_ALIAS, make_cache_key
+from .ingest import latest_from_record, weather_record_from_payload
+from .models import City
+from .views import (
+    API_KEY, coord_params, forecast_params, get_aqi_data, get_forecast, get_uvi_data, parse_forecast, weather_params,
+)
+
+BENCHMARK_DATA_DIR = Path(__file__).resolve().parent / 'benchmark_data'
+PAYLOADS = ('weather', 'forecast', 'air_pollution', 'uvi')
+
+
+def load_raw_payloads():
+    """{endpoint: JSON text} of the recorded payloads"""
+    return {name: (BENCHMARK_DATA_DIR / f'{name}.json').read_text() for name in PAYLOADS}
+
+
+class BenchmarkFixture:
+    """Objects shared by the cases, built once outside the timed code"""
+
+    def __init__(self):
+        self.raw = load_raw_payloads()
+        self.payloads = {name: json.loads(text) for name, text in self.raw.items()}
+        weather = self.payloads['weather']
+        self.city = City(
+            id=1, name=weather['name'], country=weather['sys']['country'],
+            latitude=weather['coord']['lat'], longitude=weather['coord']['lon'],
+            created_at=timezone.now(),
+        )
+        record = weather_record_from_payload(self.city, weather)
+        record.timestamp = timezone.now()
+        self.history = [record] * 10
+        self.latest = latest_from_record(record)
+        self.forecast = parse_forecast(self.payloads['forecast'])
+        self.request = RequestFactory().get(f'/city/{self.city.id}/')
+        self.prime_cache()
+        self.context = self.detail_context()
+
+    def prime_cache(self):
+        """Store the payloads where the fetchers look them up"""
+        coords = {**coord_params(self.city.latitude, self.city.longitude), 'appid': API_KEY}
+        caches[WEATHER_CACHE_ALIAS].set_many({
+            make_cache_key('weather', weather_params(self.city)): self.payloads['weather'],
+            make_cache_key('forecast', forecast_params(self.city)): self.payloads['forecast'],
+            make_cache_key('air_pollution', coords): self.payloads['air_pollution'],
+            make_cache_key('uvi', coords): self.payloads['uvi'],
+        }, timeout=None)
+
+    def detail_context(self):
+        """The context CityDetailView builds for a fresh observation"""
+        city = self.city
+        forecast = get_forecast(city)
+        return {
+            'city': city,
+            'is_favorite': False,
+            'freshness': 'fresh',
+            'current_api_data': self.latest.as_dict(),
+            'weather_history': self.history,
+            'latest_weather': self.history[0],
+            'forecast_data': forecast['daily'],
+            'hourly_forecast': forecast['hourly'],
+            'aqi_data': get_aqi_data(city.latitude, city.longitude),
+            'uvi_data': get_uvi_data(city.latitude, city.longitude),
+        }
+
+
+def build_cases(fixture):
+    """{name: zero-argument callable}"""
+    forecast = fixture.payloads['forecast']
+    weather = fixture.payloads['weather']
+    hourly = fixture.forecast['hourly']
+    return {
+        'decode_weather': lambda: json.loads(fixture.raw['weather']),
+        'decode_forecast': lambda: json.loads(fixture.raw['forecast']),
+        'parse_forecast': lambda: parse_forecast(forecast),
+        'hourly_json': lambda: JsonResponse({'hourly_forecast': hourly}),
+        'current_weather_dict': lambda: latest_from_record(
+            weather_record_from_payload(fixture.city, weather)
+        ).as_dict(),
+        'detail_context': fixture.detail_context,
+        'render_city_detail': lambda: render_to_string(
+            'WEATHERAPP/city_detail.html', fixture.context, fixture.request
+        ),
+    }
+
+
+def time_case(func, repeat=5, number=None):
+    """
+    Time func with timeit. Without `number` the loop count is chosen so one
+    repeat takes at least 0.2s. Returns per-call seconds (best and median of
+    the repeats) and the loop count.
+    """
+    timer = timeit.Timer(func)
+    if number is None:
+        number, _ = timer.autorange()
+    runs = [elapsed / number for elapsed in timer.repeat(repeat=repeat, number=number)]
+    return {'best': min(runs), 'median': statistics.median(runs), 'loops': number}
+
+
+def run_benchmarks(names=None, repeat=5, number=None):
+    """Run the selected cases (all by default). Returns {name: timing}."""
+    cases = build_cases(BenchmarkFixture())
+    unknown = set(names or ()) - set(cases)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+    return {
+        name: time_case(func, repeat=repeat, number=number)
+        for name, func in cases.items() if not names or name in names
+    }
+
+
+def compare(current, previous, threshold=0.10):
+    """
+    {name: (change, regressed)} for cases present in both runs, comparing
+    best times; change is relative (0.25 = 25% slower).
+    """
+    changes = {}
+    for name, timing in current.items():
+        if name in previous and previous[name]['best']:
+            change = timing['best'] / previous[name]['best'] - 1
+            changes[name] = (change, change > threshold)
+    return changes
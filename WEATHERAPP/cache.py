@@ -0,0 +1,285 @@
+"""
+Caching layer for OpenWeatherMap responses.
+
+Every fetcher in views.py goes through cached_json(), which keys the raw
+JSON response on the endpoint name plus its normalized query parameters
+and stores it in the 'weather' cache with a per-endpoint TTL. Concurrent
+misses for the same key are coalesced into one upstream request.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+WEATHER_CACHE_ALIAS = 'weather'
+
+# Default TTL (seconds) per upstream endpoint, overridable through
+# settings.WEATHER_CACHE_TTLS
+DEFAULT_CACHE_TTLS = {
+    'weather': 10 * 60,
+    'forecast': 60 * 60,
+    'air_pollution': 30 * 60,
+    'uvi': 30 * 60,
+}
+
+# Query parameters that never change the response body
+IGNORED_PARAMS = {'appid'}
+
+# Cross-worker request coalescing through a lock entry in the shared cache,
+# overridable through settings.WEATHER_SINGLE_FLIGHT
+DEFAULT_SINGLE_FLIGHT = {
+    'SHARED_LOCKS': False,  # Only useful with a cache shared between workers
+    'LOCK_TIMEOUT': 15,  # seconds before an abandoned lock expires
+    'WAIT_TIMEOUT': 6,  # seconds to wait for another worker's result
+    'POLL_INTERVAL': 0.05,
+}
+
+
+class LRULocMemCache(LocMemCache):
+    """
+    In-process cache that evicts expired entries first, then the single
+    least recently used entry, instead of dropping a whole fraction of
+    the cache when MAX_ENTRIES is reached
+    """
+
+    def _cull(self):
+        expired = [key for key in self._cache if self._has_expired(key)]
+        for key in expired:
+            self._delete(key)
+        if expired or not self._cache:
+            return
+        # LocMemCache keeps the most recently used key first
+        key, _ = self._cache.popitem()
+        del self._expire_info[key]
+
+
+class CacheStats:
+    """
+    Thread-safe counters per endpoint: cache hits, misses and coalesced
+    misses (served by another caller's in-flight request)
+    """
+    OUTCOMES = ('hits', 'misses', 'coalesced')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def record(self, endpoint, outcome):
+        with self._lock:
+            counter = self._counters.setdefault(endpoint, dict.fromkeys(self.OUTCOMES, 0))
+            counter[outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: dict(counter) for endpoint, counter in self._counters.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+cache_stats = CacheStats()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key within a process: the
+    first caller runs the function, later callers block and share its
+    result (or exception).
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Return (result, shared) where shared is True for coalesced callers"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+single_flight = SingleFlight()
+
+
+def get_single_flight_options():
+    return {**DEFAULT_SINGLE_FLIGHT, **getattr(settings, 'WEATHER_SINGLE_FLIGHT', {})}
+
+
+def get_cache_ttl(endpoint):
+    """Return the TTL in seconds for an upstream endpoint"""
+    ttls = {**DEFAULT_CACHE_TTLS, **getattr(settings, 'WEATHER_CACHE_TTLS', {})}
+    return ttls.get(endpoint, DEFAULT_CACHE_TTLS['weather'])
+
+
+def normalize_params(params):
+    """
+    Normalize query parameters so equivalent requests share a cache entry:
+    names are case/whitespace-insensitive and coordinates are rounded
+    """
+    normalized = []
+    for name, value in params.items():
+        if name in IGNORED_PARAMS:
+            continue
+        if isinstance(value, str):
+            value = ' '.join(value.split()).lower()
+        elif isinstance(value, float):
+            value = round(value, 4)
+        normalized.append((name, value))
+    return sorted(normalized)
+
+
+def make_cache_key(endpoint, params):
+    """Build the cache key for an endpoint and its query parameters"""
+    digest = hashlib.md5(repr(normalize_params(params)).encode()).hexdigest()
+    return f'owm:{endpoint}:{digest}'
+
+
+def cached_json(endpoint, params, fetch):
+    """
+    Return the cached response for endpoint/params, calling fetch() on a
+    miss. Concurrent misses for the same key share one fetch() call.
+    Empty results are not cached so a failed call is retried.
+    """
+    cache = caches[WEATHER_CACHE_ALIAS]
+    key = make_cache_key(endpoint, params)
+
+    data = cache.get(key)
+    if data is not None:
+        cache_stats.record(endpoint, 'hits')
+        return data
+
+    data, shared = single_flight.do(key, lambda: _fetch_and_store(cache, endpoint, key, fetch))
+    if shared:
+        cache_stats.record(endpoint, 'coalesced')
+    return data
+
+
+def refresh_json(endpoint, params, fetch):
+    """
+    Call fetch() without reading the cache and store its result, for write
+    paths that must record a new observation rather than a cached copy.
+    Concurrent refreshes of the same key share one fetch() call.
+    """
+    cache = caches[WEATHER_CACHE_ALIAS]
+    key = make_cache_key(endpoint, params)
+
+    def fetch_and_store():
+        cache_stats.record(endpoint, 'misses')
+        data = fetch()
+        if data is not None:
+            cache.set_many({key: data, f'{key}:version': time.time()}, get_cache_ttl(endpoint))
+        return data
+
+    data, shared = single_flight.do(f'{key}:refresh', fetch_and_store)
+    if shared:
+        cache_stats.record(endpoint, 'coalesced')
+    return data
+
+
+def _fetch_and_store(cache, endpoint, key, fetch):
+    """
+    Fetch and cache a missed key. With shared locks enabled, only the
+    worker holding the lock entry fetches; the others wait for its result.
+    """
+    options = get_single_flight_options()
+    lock_key = f'{key}:lock'
+    locked = options['SHARED_LOCKS'] and cache.add(lock_key, 1, options['LOCK_TIMEOUT'])
+
+    if options['SHARED_LOCKS'] and not locked:
+        deadline = time.monotonic() + options['WAIT_TIMEOUT']
+        while time.monotonic() < deadline:
+            time.sleep(options['POLL_INTERVAL'])
+            data = cache.get(key)
+            if data is not None:
+                cache_stats.record(endpoint, 'coalesced')
+                return data
+        # The other worker gave up or died; fetch ourselves
+
+    cache_stats.record(endpoint, 'misses')
+    try:
+        data = fetch()
+        if data is not None:
+            # The version (store time) lets views build HTTP validators
+            # without reading or parsing the response itself
+            cache.set_many({key: data, f'{key}:version': time.time()}, get_cache_ttl(endpoint))
+        return data
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def get_cache_version(endpoint, params):
+    """
+    Return the time the cached response for endpoint/params was stored, or
+    None when it is not cached
+    """
+    key = make_cache_key(endpoint, params)
+    version_key = f'{key}:version'
+    found = caches[WEATHER_CACHE_ALIAS].get_many([key, version_key])
+    if key not in found:
+        return None
+    return found.get(version_key)
+
+
+def cached_json_many(endpoint, params_by_id, record_misses=True):
+    """
+    Look up several requests for the same endpoint in one cache round-trip.
+    Returns {id: data} for the hits only; callers fetch the misses. Pass
+    record_misses=False when the caller fetches the misses through a path
+    that records them itself, so each miss is counted once.
+    """
+    cache = caches[WEATHER_CACHE_ALIAS]
+    keys = {make_cache_key(endpoint, params): item_id for item_id, params in params_by_id.items()}
+    found = cache.get_many(list(keys))
+
+    hits = {keys[key]: data for key, data in found.items() if data is not None}
+    for _ in hits:
+        cache_stats.record(endpoint, 'hits')
+    if record_misses:
+        for _ in range(len(keys) - len(hits)):
+            cache_stats.record(endpoint, 'misses')
+    return hits
+
+
+def store_json_many(endpoint, items):
+    """
+    Cache responses obtained another way (e.g. split out of a batched
+    request) under their own endpoint/params keys. items: [(params, data)].
+    """
+    now = time.time()
+    entries = {}
+    for params, data in items:
+        key = make_cache_key(endpoint, params)
+        entries[key] = data
+        entries[f'{key}:version'] = now
+    if entries:
+        caches[WEATHER_CACHE_ALIAS].set_many(entries, get_cache_ttl(endpoint))
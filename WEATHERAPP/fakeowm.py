@@ -0,0 +1,246 @@
+"""
+Local stand-in for the OpenWeatherMap API, for benchmarks and tests.
+
+Serves /weather, /group, /forecast, /air_pollution and /uvi (under
+/data/2.5/ like the real API) with deterministic synthetic payloads derived from the query,
+so the same city always gets the same weather. Latency, 5xx errors and 429
+throttling can be injected. In record mode requests are proxied to the real
+API and every payload is saved; in replay mode saved payloads are served
+(falling back to synthetic ones).
+
+Point the app at it with OPENWEATHERMAP_API_ROOT, e.g.
+
+    python manage.py fake_owm --port 8001 --latency 0.2
+    OPENWEATHERMAP_API_ROOT=http://127.0.0.1:8001/data/2.5 python manage.py runserver
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+from .cache import make_cache_key
+
+API_PREFIX = '/data/2.5'
+GROUP_MAX_IDS = 20
+REAL_API_ROOT = 'https://api.openweathermap.org/data/2.5'
+
+
+def _seed_for(params):
+    """Stable per-location number so repeated queries agree"""
+    location = params.get('q') or params.get('id') or f"{params.get('lat')},{params.get('lon')}"
+    return int(hashlib.md5(str(location).lower().encode()).hexdigest()[:8], 16)
+
+
+def _coords(params, seed):
+    if 'lat' in params and 'lon' in params:
+        return float(params['lat']), float(params['lon'])
+    return round((seed % 18000) / 100 - 90, 2), round((seed // 18000 % 36000) / 100 - 180, 2)
+
+
+def fake_weather(params, now=None):
+    seed = _seed_for(params)
+    lat, lon = _coords(params, seed)
+    now = int(now or time.time())
+    temp = round(seed % 400 / 10 - 5, 1)
+    conditions = [('Clear', 'clear sky'), ('Clouds', 'broken clouds'), ('Rain', 'light rain'), ('Snow', 'light snow')]
+    main, description = conditions[seed % len(conditions)]
+    return {
+        'coord': {'lat': lat, 'lon': lon},
+        'weather': [{'id': 800, 'main': main, 'description': description, 'icon': '01d'}],
+        'main': {
+            'temp': temp, 'feels_like': temp - 1, 'temp_min': temp - 2, 'temp_max': temp + 2,
+            'pressure': 990 + seed % 40, 'humidity': 30 + seed % 70,
+        },
+        'visibility': 10000,
+        'wind': {'speed': round(seed % 150 / 10, 1), 'deg': seed % 360, 'gust': round(seed % 200 / 10, 1)},
+        'clouds': {'all': seed % 101},
+        'dt': now,
+        'sys': {'country': 'XX', 'sunrise': now - 6 * 3600, 'sunset': now + 6 * 3600},
+        'id': int(params.get('id') or seed % 10_000_000),
+        'name': (params.get('q') or f'Place {seed % 100000}').split(',')[0],
+        'cod': 200,
+    }
+
+
+def fake_forecast(params, now=None):
+    current = fake_weather(params, now)
+    start = current['dt'] - current['dt'] % (3 * 3600)
+    entries = []
+    for index in range(int(params.get('cnt', 40))):
+        temp = round(current['main']['temp'] + (index % 8 - 4) * 0.7, 1)
+        entries.append({
+            'dt': start + index * 3 * 3600,
+            'main': {
+                'temp': temp, 'feels_like': temp - 1, 'temp_min': temp - 1, 'temp_max': temp + 1,
+                'pressure': current['main']['pressure'], 'humidity': current['main']['humidity'],
+            },
+            'weather': current['weather'],
+            'clouds': current['clouds'],
+            'wind': current['wind'],
+            'pop': (index * 13 % 100) / 100,
+        })
+    return {'cod': '200', 'cnt': len(entries), 'list': entries, 'city': {'name': current['name'], 'coord': current['coord']}}
+
+
+def fake_air_pollution(params, now=None):
+    seed = _seed_for(params)
+    return {
+        'coord': {'lat': float(params.get('lat', 0)), 'lon': float(params.get('lon', 0))},
+        'list': [{
+            'main': {'aqi': 1 + seed % 5},
+            'components': {'pm2_5': seed % 500 / 10, 'pm10': seed % 900 / 10, 'no2': seed % 300 / 10, 'o3': seed % 1200 / 10},
+            'dt': int(now or time.time()),
+        }],
+    }
+
+
+def fake_uvi(params, now=None):
+    return {
+        'lat': float(params.get('lat', 0)),
+        'lon': float(params.get('lon', 0)),
+        'date': int(now or time.time()),
+        'value': round(_seed_for(params) % 110 / 10, 1),
+    }
+
+
+def fake_group(params, now=None):
+    """Current weather for ?id=1,2,3 (unknown ids get synthetic weather too)"""
+    owm_ids = [owm_id for owm_id in params.get('id', '').split(',') if owm_id]
+    items = [fake_weather({'id': owm_id}, now) for owm_id in owm_ids]
+    return {'cnt': len(items), 'list': items}
+
+
+# endpoint -> synthetic payload builder
+FAKE_ENDPOINTS = {
+    'weather': fake_weather,
+    'group': fake_group,
+    'forecast': fake_forecast,
+    'air_pollution': fake_air_pollution,
+    'uvi': fake_uvi,
+}
+
+
+class FakeOWMServer:
+    """
+    Threaded HTTP server imitating OpenWeatherMap.
+
+    latency/jitter   - seconds added to every response (jitter is uniform extra)
+    error_rate       - fraction of requests answered with 500
+    throttle_rate    - fraction of requests answered with 429 + Retry-After
+    record_dir       - proxy to upstream_root and save payloads here
+    replay_dir       - serve payloads saved by record mode when available
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 throttle_rate=0.0, record_dir=None, replay_dir=None, upstream_root=REAL_API_ROOT,
+                 seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.record_dir = Path(record_dir) if record_dir else None
+        self.replay_dir = Path(replay_dir) if replay_dir else None
+        self.upstream_root = upstream_root.rstrip('/')
+        self.random = random.Random(seed)
+        self.counts = {}  # (endpoint, status) -> requests served
+        self._lock = threading.Lock()
+        self._thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def api_root(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}{API_PREFIX}'
+
+    def start(self):
+        """Serve in a background thread"""
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, kwargs={'poll_interval': 0.05}, name='fake-owm', daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _roll(self):
+        with self._lock:
+            return self.random.random()
+
+    def _count(self, endpoint, status):
+        with self._lock:
+            self.counts[(endpoint, status)] = self.counts.get((endpoint, status), 0) + 1
+
+    def _payload_path(self, directory, endpoint, params):
+        return directory / (make_cache_key(endpoint, params).replace(':', '_') + '.json')
+
+    def respond(self, endpoint, params):
+        """Return (status, headers, payload) for one request"""
+        delay = self.latency + (self.jitter * self._roll() if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if endpoint not in FAKE_ENDPOINTS:
+            return 404, {}, {'cod': '404', 'message': 'Internal error'}
+        if self.throttle_rate and self._roll() < self.throttle_rate:
+            return 429, {'Retry-After': '1'}, {'cod': 429, 'message': 'Your account is temporary blocked'}
+        if self.error_rate and self._roll() < self.error_rate:
+            return 500, {}, {'cod': 500, 'message': 'Internal server error'}
+        if endpoint == 'group' and len(params.get('id', '').split(',')) > GROUP_MAX_IDS:
+            return 400, {}, {'cod': '400', 'message': f'Too many ids (max {GROUP_MAX_IDS})'}
+
+        if self.replay_dir:
+            path = self._payload_path(self.replay_dir, endpoint, params)
+            if path.exists():
+                return 200, {}, json.loads(path.read_text())
+        if self.record_dir:
+            response = requests.get(f'{self.upstream_root}/{endpoint}', params=params, timeout=10)
+            payload = response.json()
+            if response.ok:
+                self.record_dir.mkdir(parents=True, exist_ok=True)
+                self._payload_path(self.record_dir, endpoint, params).write_text(json.dumps(payload))
+            return response.status_code, {}, payload
+        return 200, {}, FAKE_ENDPOINTS[endpoint](params)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+            disable_nagle_algorithm = True  # don't add delayed-ACK stalls to measured latency
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                endpoint = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else url.path
+                endpoint = endpoint.strip('/')
+                status, headers, payload = server.respond(endpoint, dict(parse_qsl(url.query)))
+                server._count(endpoint, status)
+
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
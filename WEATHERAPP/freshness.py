@@ -0,0 +1,71 @@
+"""
+Freshness model for stored observations (stale-while-revalidate).
+
+An observation is classified by the age of its WeatherData timestamp:
+  fresh   - served as-is
+  stale   - served, and a background refresh is scheduled
+  expired - too old to show, the caller fetches synchronously
+Thresholds come from settings.WEATHER_FRESHNESS.
+"""
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+FRESH = 'fresh'
+STALE = 'stale'
+EXPIRED = 'expired'
+
+DEFAULT_FRESHNESS = {
+    'FRESH_SECONDS': 10 * 60,
+    'STALE_SECONDS': 60 * 60,
+}
+
+
+def get_freshness(observed_at, now=None):
+    """Classify an observation time; a missing observation is expired"""
+    if observed_at is None:
+        return EXPIRED
+    thresholds = {**DEFAULT_FRESHNESS, **getattr(settings, 'WEATHER_FRESHNESS', {})}
+    age = ((now or timezone.now()) - observed_at).total_seconds()
+    if age < thresholds['FRESH_SECONDS']:
+        return FRESH
+    if age < thresholds['STALE_SECONDS']:
+        return STALE
+    return EXPIRED
+
+
+class BackgroundRefresher:
+    """
+    Runs refreshes on an executor, coalescing requests for the same key:
+    while a refresh for a key is in flight further requests are dropped,
+    so a burst of visitors triggers one upstream call.
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, key, func, *args):
+        """Schedule func(*args) unless key is already refreshing. Returns True if scheduled."""
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+        self.executor.submit(self._run, key, func, *args)
+        return True
+
+    def is_refreshing(self, key):
+        with self._lock:
+            return key in self._in_flight
+
+    def _run(self, key, func, *args):
+        try:
+            func(*args)
+        finally:
+            # Worker threads get their own DB connection; don't leak it
+            close_old_connections()
+            with self._lock:
+                self._in_flight.discard(key)
@@ -0,0 +1,139 @@
+"""
+Shared HTTP client for OpenWeatherMap requests.
+
+One requests.Session is reused by every fetcher so connections (and their
+TLS handshakes) are pooled and kept alive between calls. Tuning comes from
+settings.OPENWEATHERMAP_HTTP; see DEFAULT_HTTP_OPTIONS for the keys.
+
+Calls made while serving a request fail fast: they are never retried, so a
+page waits at most one connect plus one read timeout. Only calls made inside
+background_calls() (update_weather, the scheduler) retry 429/5xx responses
+and network errors, with backoff and a capped Retry-After; given a rate
+limiter, every attempt, retries included, takes a token from it.
+"""
+import threading
+from contextlib import contextmanager
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_HTTP_OPTIONS = {
+    'CONNECT_TIMEOUT': 3.05,  # seconds to establish a connection
+    'READ_TIMEOUT': 5,  # seconds to wait for the response
+    'POOL_CONNECTIONS': 4,  # number of hosts to keep a pool for
+    'POOL_MAXSIZE': 16,  # connections kept alive per host
+    'MAX_RETRIES': 2,  # background calls only
+    'BACKOFF_FACTOR': 0.3,  # sleeps 0.3s, 0.6s, ... between retries
+    'BACKOFF_MAX': 10,  # longest backoff sleep
+    'RETRY_AFTER_MAX': 30,  # longest wait honoured from a Retry-After header
+    'RETRY_STATUSES': (429, 500, 502, 503, 504),
+}
+
+_sessions = {}  # background? -> session
+_session_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_http_options():
+    """Return the effective client options"""
+    return {**DEFAULT_HTTP_OPTIONS, **getattr(settings, 'OPENWEATHERMAP_HTTP', {})}
+
+
+class CappedRetry(Retry):
+    """
+    Retry whose Retry-After waits are capped at RETRY_AFTER_MAX and whose
+    attempts take a token from the background_calls() rate limiter
+    """
+
+    def sleep(self, response=None):
+        super().sleep(response)
+        rate_limiter = getattr(_local, 'rate_limiter', None)
+        if rate_limiter:
+            rate_limiter.acquire()
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, get_http_options()['RETRY_AFTER_MAX'])
+
+
+def build_session(options=None, background=False):
+    """
+    Create a session with connection pooling. Background sessions retry
+    with backoff; the others never retry.
+    """
+    options = options or get_http_options()
+    retry = 0
+    if background:
+        retry = CappedRetry(
+            total=options['MAX_RETRIES'],
+            backoff_factor=options['BACKOFF_FACTOR'],
+            backoff_max=options['BACKOFF_MAX'],
+            status_forcelist=options['RETRY_STATUSES'],
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+    adapter = HTTPAdapter(
+        pool_connections=options['POOL_CONNECTIONS'],
+        pool_maxsize=options['POOL_MAXSIZE'],
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(background=False):
+    """Return the process-wide (background or interactive) session, creating it on first use"""
+    session = _sessions.get(background)
+    if session is None:
+        with _session_lock:
+            session = _sessions.get(background)
+            if session is None:
+                session = _sessions[background] = build_session(background=background)
+    return session
+
+
+def reset_session():
+    """Close the shared sessions so the next call builds new ones"""
+    with _session_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+@contextmanager
+def background_calls(rate_limiter=None):
+    """
+    Calls made by this thread inside the block use the retrying session and
+    take a token from rate_limiter (a TokenBucket) per attempt
+    """
+    previous = getattr(_local, 'background', False), getattr(_local, 'rate_limiter', None)
+    _local.background, _local.rate_limiter = True, rate_limiter
+    try:
+        yield
+    finally:
+        _local.background, _local.rate_limiter = previous
+
+
+def get_json(url, params):
+    """
+    GET a JSON resource through the shared session.
+    Raises requests.exceptions.RequestException on network or HTTP errors.
+    """
+    options = get_http_options()
+    rate_limiter = getattr(_local, 'rate_limiter', None)
+    if rate_limiter:
+        rate_limiter.acquire()
+    response = get_session(background=getattr(_local, 'background', False)).get(
+        url,
+        params=params,
+        timeout=(options['CONNECT_TIMEOUT'], options['READ_TIMEOUT']),
+    )
+    response.raise_for_status()
+    return response.json()
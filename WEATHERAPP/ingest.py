@@ -0,0 +1,159 @@
+"""
+Write path for weather observations fetched from OpenWeatherMap.
+
+weather_record_from_payload() is the single mapping from an API payload to
+a WeatherData instance, and WeatherDataWriter buffers records and flushes
+them with bulk_create, one short transaction per batch.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import City, LatestWeather, WeatherData
+from .rollups import apply_rollups
+
+DEFAULT_BATCH_SIZE = 500
+
+# Observation fields copied from WeatherData into the LatestWeather projection
+LATEST_FIELDS = [
+    'temperature', 'feels_like', 'temp_min', 'temp_max', 'humidity', 'pressure',
+    'weather_main', 'weather_description', 'wind_speed', 'wind_deg', 'wind_gust',
+    'cloudiness', 'visibility', 'sunrise', 'sunset',
+]
+
+
+def weather_record_from_payload(city, data):
+    """
+    Build an unsaved WeatherData from a current weather API payload.
+    The payload's city id and coordinates are kept on the record
+    (upstream_id, upstream_coord) so the writer can store them on the City.
+    The id is only kept when the city was looked up by name or id: a lookup
+    by coordinates answers with whichever station is nearest, whose id need
+    not be the city's.
+    """
+    main = data['main']
+    wind = data['wind']
+    sys_info = data.get('sys', {})
+    record = WeatherData(
+        city=city,
+        temperature=main['temp'],
+        feels_like=main.get('feels_like'),
+        temp_min=main.get('temp_min'),
+        temp_max=main.get('temp_max'),
+        humidity=main['humidity'],
+        pressure=main['pressure'],
+        weather_main=data['weather'][0]['main'],
+        weather_description=data['weather'][0]['description'],
+        wind_speed=wind['speed'],
+        wind_deg=wind.get('deg'),
+        wind_gust=wind.get('gust'),
+        cloudiness=data['clouds']['all'],
+        visibility=data.get('visibility'),
+        sunrise=sys_info.get('sunrise'),
+        sunset=sys_info.get('sunset'),
+    )
+    by_coordinates = city.latitude is not None and city.longitude is not None
+    record.upstream_id = None if by_coordinates else data.get('id')
+    record.upstream_coord = data.get('coord')
+    return record
+
+
+def latest_from_record(record):
+    """Build the LatestWeather projection row for a (saved) WeatherData"""
+    return LatestWeather(
+        city=record.city,
+        observed_at=record.timestamp,
+        **{field: getattr(record, field) for field in LATEST_FIELDS}
+    )
+
+
+class WeatherDataWriter:
+    """
+    Buffered WeatherData writer.
+
+    Usage:
+        with WeatherDataWriter(batch_size=200) as writer:
+            for city, data in results:
+                writer.add(weather_record_from_payload(city, data))
+
+    Records are flushed every batch_size additions and on exit. Each flush
+    is its own transaction, so no write lock is held between batches (fetch
+    payloads before handing them to the writer, never while it is open).
+    Records still buffered when the block raises are discarded. Each flush
+    also upserts the LatestWeather row of every city in the batch, folds
+    the batch into the hourly/daily rollups and stores newly seen upstream
+    city ids and missing city coordinates.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.written = 0
+        self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+        else:
+            self._buffer = []
+        return False
+
+    def add(self, record):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered records in one transaction"""
+        if not self._buffer:
+            return
+        records, self._buffer = self._buffer, []
+        with transaction.atomic():
+            self._write(records)
+        self.written += len(records)
+
+    def _write(self, records):
+        WeatherData.objects.bulk_create(records, batch_size=self.batch_size)
+        
+        # Newest record per city wins (timestamps are set by bulk_create)
+        newest = {}
+        for record in records:
+            newest[record.city_id] = record
+        LatestWeather.objects.bulk_create(
+            [latest_from_record(record) for record in newest.values()],
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            unique_fields=['city'],
+            update_fields=LATEST_FIELDS + ['observed_at'],
+        )
+        apply_rollups(records, batch_size=self.batch_size)
+        
+        # Remember upstream city ids (so refreshes can be batched by id) and
+        # fill in missing coordinates (so later fetches skip name lookups)
+        cities = {}
+        for record in records:
+            city = record.city
+            upstream_id = getattr(record, 'upstream_id', None)
+            if upstream_id and city.owm_id != upstream_id:
+                city.owm_id = upstream_id
+                cities[record.city_id] = city
+            coord = getattr(record, 'upstream_coord', None)
+            if coord and (city.latitude is None or city.longitude is None):
+                city.latitude, city.longitude = coord['lat'], coord['lon']
+                cities[record.city_id] = city
+        if cities:
+            now = timezone.now()
+            for city in cities.values():
+                city.updated_at = now
+            City.objects.bulk_update(
+                cities.values(), ['owm_id', 'latitude', 'longitude', 'updated_at'], batch_size=self.batch_size
+            )
+
+
+def record_weather(city, data):
+    """Map and save a single observation, returning the saved record"""
+    record = weather_record_from_payload(city, data)
+    with WeatherDataWriter() as writer:
+        writer.add(record)
+    return record
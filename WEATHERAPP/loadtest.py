@@ -0,0 +1,93 @@
+"""
+Minimal HTTP load driver (see the load_test command).
+
+Worker threads, each with its own keep-alive session, issue GETs against a
+running instance of the app, cycling through the given paths, and record
+per-request latency. Results are summarised per path as request and error
+counts, throughput and latency percentiles.
+"""
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list (None when empty)"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))  # ceil without floats
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples, elapsed):
+    """
+    samples: {path: [(status, seconds), ...]} -> {path: stats}. Latency
+    percentiles are in milliseconds; rps is successful-or-not requests per
+    second of wall time.
+    """
+    summary = {}
+    for path, results in samples.items():
+        latencies = sorted(seconds * 1000 for _, seconds in results)
+        errors = sum(1 for status, _ in results if status is None or status >= 400)
+        summary[path] = {
+            'requests': len(results),
+            'errors': errors,
+            'rps': len(results) / elapsed if elapsed else 0.0,
+            'mean_ms': sum(latencies) / len(latencies) if latencies else None,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+        }
+    return summary
+
+
+def run_load(base_url, paths, concurrency=10, requests_per_path=100, duration=None, timeout=30):
+    """
+    Drive load at base_url. Runs requests_per_path requests per path, or
+    keeps going for `duration` seconds when given. Returns (summary, elapsed).
+    A failed connection is recorded with status None.
+    """
+    base_url = base_url.rstrip('/')
+    samples = {path: [] for path in paths}
+    jobs = itertools.cycle(paths)
+    remaining = [None if duration else requests_per_path * len(paths)]
+    lock = threading.Lock()
+    local = threading.local()
+
+    def next_job(deadline):
+        with lock:
+            if deadline is not None:
+                return next(jobs) if time.monotonic() < deadline else None
+            if remaining[0] == 0:
+                return None
+            remaining[0] -= 1
+            return next(jobs)
+
+    def worker(deadline):
+        local.session = requests.Session()
+        try:
+            while True:
+                path = next_job(deadline)
+                if path is None:
+                    return
+                started = time.perf_counter()
+                try:
+                    status = local.session.get(base_url + path, timeout=timeout).status_code
+                except requests.exceptions.RequestException:
+                    status = None
+                latency = time.perf_counter() - started
+                with lock:
+                    samples[path].append((status, latency))
+        finally:
+            local.session.close()
+
+    started = time.monotonic()
+    deadline = started + duration if duration else None
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='load') as executor:
+        for future in [executor.submit(worker, deadline) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.monotonic() - started
+    return summarize(samples, elapsed), elapsed
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from WEATHERAPP.models import City, DailyWeatherRollup, HourlyWeatherRollup, WeatherData
+from WEATHERAPP.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild hourly and daily weather rollups from raw WeatherData '
+        '(buckets older than the oldest raw row are kept)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--city',
+            type=str,
+            help='Rebuild rollups for specific city (by name)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of raw records folded per step (default: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        records = WeatherData.objects.all()
+        if options['city']:
+            try:
+                city = City.objects.get(name__iexact=options['city'])
+            except City.DoesNotExist:
+                raise CommandError(f"City '{options['city']}' not found")
+            records = records.filter(city=city)
+        city_ids = list(records.order_by('city_id').values_list('city_id', flat=True).distinct())
+
+        started = time.monotonic()
+        processed = 0
+        for city_id in city_ids:
+            # One transaction per city keeps write locks short
+            with transaction.atomic():
+                processed += rebuild_rollups(city_id, chunk_size=options['chunk_size'])
+
+        elapsed = time.monotonic() - started
+        hourly = HourlyWeatherRollup.objects.filter(city_id__in=city_ids)
+        daily = DailyWeatherRollup.objects.filter(city_id__in=city_ids)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rolled up {processed} records into {hourly.count()} hourly '
+                f'and {daily.count()} daily buckets in {elapsed:.1f}s'
+            )
+        )
@@ -0,0 +1,96 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from WEATHERAPP.benchmarks import compare, run_benchmarks
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Run the page-building micro-benchmarks and record the results'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names',
+            nargs='*',
+            help='Benchmarks to run (default: all)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timing repeats per benchmark; the best is reported (default: 5)',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=str(Path(settings.BASE_DIR) / 'benchmark_results.jsonl'),
+            help='Results history file, one JSON run per line (default: benchmark_results.jsonl)',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.10,
+            help='Relative slowdown versus the previous run reported as a regression (default: 0.10)',
+        )
+        parser.add_argument(
+            '--no-save',
+            action='store_true',
+            help='Compare with the previous run without recording this one',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        try:
+            results = run_benchmarks(options['names'] or None, repeat=options['repeat'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        output = Path(options['output'])
+        previous = {}
+        if output.exists():
+            lines = output.read_text().splitlines()
+            if lines:
+                last = json.loads(lines[-1])
+                previous = last['results']
+                self.stdout.write(f"Compared with {last.get('commit') or 'unknown commit'} ({last['recorded_at']})")
+        changes = compare(results, previous, options['threshold'])
+
+        self.stdout.write(f"{'benchmark':<24} {'best µs':>10} {'median µs':>10} {'change':>8}")
+        regressions = 0
+        for name, timing in results.items():
+            change, regressed = changes.get(name, (None, False))
+            line = (
+                f"{name:<24} {timing['best'] * 1e6:>10.1f} {timing['median'] * 1e6:>10.1f} "
+                f"{'' if change is None else f'{change:+.0%}':>8}"
+            )
+            if regressed:
+                regressions += 1
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+
+        if not options['no_save']:
+            with output.open('a') as f:
+                f.write(json.dumps({
+                    'commit': current_commit(),
+                    'recorded_at': datetime.now(timezone.utc).isoformat(),
+                    'python': platform.python_version(),
+                    'results': results,
+                }) + '\n')
+            self.stdout.write(f'Results appended to {output}')
+        if regressions:
+            self.stdout.write(self.style.WARNING(f'{regressions} benchmark(s) slower than the previous run'))
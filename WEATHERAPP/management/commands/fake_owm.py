@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand, CommandError
+from WEATHERAPP.fakeowm import REAL_API_ROOT, FakeOWMServer
+
+
+class Command(BaseCommand):
+    help = 'Run a local stand-in for the OpenWeatherMap API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.0,
+            help='Seconds added to every response (default: 0)',
+        )
+        parser.add_argument(
+            '--jitter',
+            type=float,
+            default=0.0,
+            help='Up to this many extra seconds, uniformly random (default: 0)',
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0.0,
+            help='Fraction of requests answered with HTTP 500 (default: 0)',
+        )
+        parser.add_argument(
+            '--throttle-rate',
+            type=float,
+            default=0.0,
+            help='Fraction of requests answered with HTTP 429 (default: 0)',
+        )
+        parser.add_argument(
+            '--record',
+            type=str,
+            default=None,
+            metavar='DIR',
+            help='Proxy to the real API and save every payload to DIR',
+        )
+        parser.add_argument(
+            '--replay',
+            type=str,
+            default=None,
+            metavar='DIR',
+            help='Serve payloads recorded in DIR (synthetic ones otherwise)',
+        )
+        parser.add_argument(
+            '--upstream',
+            type=str,
+            default=REAL_API_ROOT,
+            help='API root proxied in record mode',
+        )
+        parser.add_argument('--seed', type=int, default=None, help='Seed for error injection')
+
+    def handle(self, *args, **options):
+        for name in ('error_rate', 'throttle_rate'):
+            if not 0 <= options[name] <= 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be between 0 and 1")
+        if options['record'] and options['replay']:
+            raise CommandError('--record and --replay are mutually exclusive')
+
+        server = FakeOWMServer(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            throttle_rate=options['throttle_rate'],
+            record_dir=options['record'],
+            replay_dir=options['replay'],
+            upstream_root=options['upstream'],
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Fake OpenWeatherMap API at {server.api_root}'))
+        self.stdout.write(f'Run the app with OPENWEATHERMAP_API_ROOT={server.api_root}')
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.httpd.server_close()
+            served = sum(server.counts.values())
+            self.stdout.write(f'Served {served} requests')
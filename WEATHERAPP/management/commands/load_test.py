@@ -0,0 +1,87 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from WEATHERAPP.loadtest import run_load
+
+
+class Command(BaseCommand):
+    help = 'Drive HTTP load at a running instance and report latency percentiles per URL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url',
+            type=str,
+            default='http://127.0.0.1:8000',
+            help='Root of the running app (default: http://127.0.0.1:8000)',
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Path to request; repeat for several (default: / and /cities/)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=10,
+            help='Number of concurrent clients (default: 10)',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=100,
+            help='Requests per path (default: 100)',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=None,
+            help='Run for this many seconds instead of a fixed number of requests',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Also write the results as JSON to this file',
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+        paths = options['paths'] or ['/', '/cities/']
+
+        summary, elapsed = run_load(
+            options['base_url'],
+            paths,
+            concurrency=options['concurrency'],
+            requests_per_path=options['requests'],
+            duration=options['duration'],
+        )
+
+        self.stdout.write(
+            f"{'path':<40} {'reqs':>6} {'errs':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for path, stats in summary.items():
+            percentiles = ' '.join(
+                f"{stats[key]:>8.1f}" if stats[key] is not None else f"{'-':>8}"
+                for key in ('p50_ms', 'p95_ms', 'p99_ms')
+            )
+            line = f"{path:<40} {stats['requests']:>6} {stats['errors']:>5} {stats['rps']:>8.1f} {percentiles}"
+            self.stdout.write(self.style.ERROR(line) if stats['errors'] else line)
+
+        total = sum(stats['requests'] for stats in summary.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s) '
+            f"at concurrency {options['concurrency']}"
+        ))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'base_url': options['base_url'],
+                    'concurrency': options['concurrency'],
+                    'elapsed': elapsed,
+                    'results': summary,
+                }, f, indent=2)
@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from WEATHERAPP.retention import (
+    RETENTION_TIERS, database_size, get_retention_days, prune_tier, unrolled_raw_rows, vacuum,
+)
+
+
+class Command(BaseCommand):
+    help = 'Delete weather data older than the configured retention policy'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Rows deleted per transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows would be deleted',
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='Run VACUUM afterwards to shrink the SQLite file',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        try:
+            policy = get_retention_days()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.monotonic()
+        size_before = database_size()
+        total = 0
+
+        for tier in RETENTION_TIERS:
+            days = policy[tier]
+            if days is None:
+                self.stdout.write(f'{tier}: kept forever')
+                continue
+            pruned = prune_tier(
+                tier, days, chunk_size=options['chunk_size'], dry_run=options['dry_run']
+            )
+            total += pruned
+            verb = 'would prune' if options['dry_run'] else 'pruned'
+            self.stdout.write(f'{tier}: {verb} {pruned} rows older than {days} days')
+
+        unrolled = unrolled_raw_rows().count()
+        if unrolled:
+            self.stdout.write(self.style.WARNING(
+                f'Kept {unrolled} raw rows that are not rolled up yet; run backfill_rollups'
+            ))
+
+        if options['vacuum'] and not options['dry_run']:
+            vacuum()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'Pruned {total} rows in {elapsed:.1f}s')
+        )
+
+        size_after = database_size()
+        if size_before and size_after and not options['dry_run']:
+            # Without VACUUM SQLite keeps freed pages in the file for reuse
+            reclaimed = (size_before[0] - size_after[0]) + (size_after[1] - size_before[1])
+            self.stdout.write(
+                f'Database size {size_after[0] / 1024:.0f} KiB, '
+                f'reclaimed {max(reclaimed, 0) / 1024:.0f} KiB'
+            )
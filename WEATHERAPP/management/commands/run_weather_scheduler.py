@@ -0,0 +1,76 @@
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from WEATHERAPP.http_client import background_calls
+from WEATHERAPP.models import City
+from WEATHERAPP.ratelimit import TokenBucket
+from WEATHERAPP.scheduler import RefreshScheduler
+from WEATHERAPP.views import refresh_city_weather
+
+
+class Command(BaseCommand):
+    help = 'Continuously refresh weather data, each city on its own cadence'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of concurrent refreshes (default: 4)',
+        )
+        parser.add_argument(
+            '--rate',
+            type=str,
+            default=None,
+            help='Upstream request limit matching the API plan, e.g. 60/min',
+        )
+        parser.add_argument(
+            '--burst',
+            type=int,
+            default=1,
+            help='Upstream calls allowed back to back under --rate (default: 1, evenly spaced)',
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        try:
+            self.rate_limiter = (
+                TokenBucket.from_string(options['rate'], options['burst']) if options['rate'] else None
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        stop_event = threading.Event()
+
+        def request_stop(signum, frame):
+            self.stdout.write(self.style.WARNING('Shutting down after in-flight refreshes...'))
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+
+        scheduler = RefreshScheduler()
+        self.stdout.write(self.style.SUCCESS('Weather scheduler started'))
+        executor = ThreadPoolExecutor(max_workers=options['workers'])
+        try:
+            scheduler.run(self.refresh_city, executor, stop_event, max_in_flight=options['workers'])
+        finally:
+            # Wait for in-flight refreshes only; anything still queued is dropped
+            executor.shutdown(wait=True, cancel_futures=True)
+        self.stdout.write(self.style.SUCCESS('Weather scheduler stopped'))
+
+    def refresh_city(self, city_id):
+        """Refresh one city, honouring the rate limit"""
+        try:
+            city = City.objects.get(pk=city_id)
+        except City.DoesNotExist:
+            return
+        with background_calls(self.rate_limiter):
+            refreshed = refresh_city_weather(city)
+        if refreshed:
+            self.stdout.write(self.style.SUCCESS(f"✓ Updated {city.name}"))
+        else:
+            self.stdout.write(self.style.ERROR(f"✗ Failed to update {city.name}"))
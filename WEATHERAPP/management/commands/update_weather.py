@@ -1,6 +1,12 @@
-from django.core.management.base import BaseCommand
-from WEATHERAPP.models import City, WeatherData
-from WEATHERAPP.views import get_weather_data
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from WEATHERAPP.http_client import background_calls
+from WEATHERAPP.ingest import WeatherDataWriter, weather_record_from_payload
+from WEATHERAPP.models import City
+from WEATHERAPP.ratelimit import TokenBucket
+from WEATHERAPP.views import fetch_weather_batch, weather_request_batches
 
 
 class Command(BaseCommand):
@@ -12,53 +18,112 @@ class Command(BaseCommand):
             type=str,
             help='Update weather for specific city (by name)',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of concurrent upstream requests (default: 1)',
+        )
+        parser.add_argument(
+            '--rate',
+            type=str,
+            default=None,
+            help='Upstream request limit matching the API plan, e.g. 60/min',
+        )
+        parser.add_argument(
+            '--burst',
+            type=int,
+            default=1,
+            help='Upstream calls allowed back to back under --rate (default: 1, evenly spaced)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of weather records written per INSERT (default: 100)',
+        )
 
     def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        try:
+            self.rate_limiter = (
+                TokenBucket.from_string(options['rate'], options['burst']) if options['rate'] else None
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
         if options['city']:
             # Update specific city
             try:
                 city = City.objects.get(name__iexact=options['city'])
-                self.update_city_weather(city)
             except City.DoesNotExist:
                 self.stdout.write(
                     self.style.ERROR(f"City '{options['city']}' not found")
                 )
+                return
+            cities = [city]
         else:
             # Update all cities
-            cities = City.objects.all()
-            if not cities.exists():
+            cities = list(City.objects.all())
+            if not cities:
                 self.stdout.write(
                     self.style.WARNING('No cities in database. Add cities first!')
                 )
                 return
 
-            for city in cities:
-                self.update_city_weather(city)
+        self.update_cities(cities, options['workers'], options['batch_size'])
 
-            self.stdout.write(
-                self.style.SUCCESS(f'Updated {cities.count()} cities')
-            )
+    def fetch_batch(self, batch):
+        """
+        Fetch current weather for one batch of cities (one upstream call),
+        honouring the rate limit (retries take a token too)
+        """
+        with background_calls(self.rate_limiter):
+            return fetch_weather_batch(batch, fresh=True)
 
-    def update_city_weather(self, city):
-        """Update weather data for a single city"""
-        data = get_weather_data(city.name)
+    def update_cities(self, cities, workers, batch_size):
+        """
+        Fetch weather concurrently, then write records in batches. Cities
+        whose upstream id is known are fetched 20 per call. Nothing is
+        written while fetches are in flight, so the run never holds a
+        database lock across network calls or rate-limit waits.
+        """
+        started = time.monotonic()
+        updated = failed = 0
+        batches = weather_request_batches(cities)
+        records = []
 
-        if data and 'main' in data:
-            WeatherData.objects.create(
-                city=city,
-                temperature=data['main']['temp'],
-                feels_like=data['main'].get('feels_like'),
-                humidity=data['main']['humidity'],
-                pressure=data['main']['pressure'],
-                weather_main=data['weather'][0]['main'],
-                weather_description=data['weather'][0]['description'],
-                wind_speed=data['wind']['speed'],
-                cloudiness=data['clouds']['all'],
-            )
-            self.stdout.write(
-                self.style.SUCCESS(f"✓ Updated {city.name}")
-            )
-        else:
-            self.stdout.write(
-                self.style.ERROR(f"✗ Failed to update {city.name}")
-            )
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.fetch_batch, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                results = future.result()
+                for city in futures[future]:
+                    data = results.get(city.id)
+                    if data and 'main' in data:
+                        records.append(weather_record_from_payload(city, data))
+                        updated += 1
+                        self.stdout.write(
+                            self.style.SUCCESS(f"✓ Updated {city.name}")
+                        )
+                    else:
+                        failed += 1
+                        self.stdout.write(
+                            self.style.ERROR(f"✗ Failed to update {city.name}")
+                        )
+
+        with WeatherDataWriter(batch_size=batch_size) as writer:
+            for record in records:
+                writer.add(record)
+
+        elapsed = time.monotonic() - started
+        throughput = len(cities) / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(f'Updated {updated} cities')
+        )
+        self.stdout.write(
+            f'{len(cities)} cities in {elapsed:.1f}s '
+            f'({throughput:.1f} cities/s, {len(batches)} upstream calls), {failed} failed'
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.28 on 2026-10-17 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WEATHERAPP', '0003_weatherdata_aqi_weatherdata_rain_probability_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['-added_at'], name='favorite_added_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchhistory',
+            index=models.Index(fields=['-searched_at'], name='search_searched_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchhistory',
+            index=models.Index(fields=['city', '-searched_at'], name='search_city_searched_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherdata',
+            index=models.Index(fields=['city', '-timestamp'], name='weather_city_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherdata',
+            index=models.Index(fields=['-timestamp'], name='weather_timestamp_idx'),
+        ),
+    ]
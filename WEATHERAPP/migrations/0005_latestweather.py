@@ -0,0 +1,66 @@
+# Generated by Django 4.2.28 on 2026-10-17 07:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+LATEST_FIELDS = [
+    'temperature', 'feels_like', 'temp_min', 'temp_max', 'humidity', 'pressure',
+    'weather_main', 'weather_description', 'wind_speed', 'wind_deg', 'wind_gust',
+    'cloudiness', 'visibility', 'sunrise', 'sunset',
+]
+
+
+def backfill_latest_weather(apps, schema_editor):
+    """Seed LatestWeather from the newest existing WeatherData row per city"""
+    WeatherData = apps.get_model('WEATHERAPP', 'WeatherData')
+    LatestWeather = apps.get_model('WEATHERAPP', 'LatestWeather')
+    
+    latest = {}
+    for record in WeatherData.objects.order_by('city_id', '-timestamp', '-id').iterator():
+        latest.setdefault(record.city_id, record)
+    
+    LatestWeather.objects.bulk_create([
+        LatestWeather(
+            city_id=city_id,
+            observed_at=record.timestamp,
+            **{field: getattr(record, field) for field in LATEST_FIELDS}
+        )
+        for city_id, record in latest.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WEATHERAPP', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestWeather',
+            fields=[
+                ('city', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_weather', serialize=False, to='WEATHERAPP.city')),
+                ('temperature', models.FloatField()),
+                ('feels_like', models.FloatField(blank=True, null=True)),
+                ('temp_min', models.FloatField(blank=True, null=True)),
+                ('temp_max', models.FloatField(blank=True, null=True)),
+                ('humidity', models.IntegerField()),
+                ('pressure', models.IntegerField()),
+                ('weather_main', models.CharField(max_length=100)),
+                ('weather_description', models.CharField(max_length=255)),
+                ('wind_speed', models.FloatField()),
+                ('wind_deg', models.FloatField(blank=True, null=True)),
+                ('wind_gust', models.FloatField(blank=True, null=True)),
+                ('cloudiness', models.IntegerField()),
+                ('visibility', models.IntegerField(blank=True, null=True)),
+                ('sunrise', models.IntegerField(blank=True, null=True)),
+                ('sunset', models.IntegerField(blank=True, null=True)),
+                ('observed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Latest Weather',
+            },
+        ),
+        migrations.RunPython(backfill_latest_weather, migrations.RunPython.noop),
+    ]
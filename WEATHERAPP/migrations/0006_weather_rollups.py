@@ -0,0 +1,125 @@
+# Generated by Django 4.2.28 on 2026-10-17 07:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+CHUNK_SIZE = 2000
+
+
+def hour_bucket(timestamp):
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(timestamp):
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def fold(rollup, record):
+    """Fold one observation into a rollup bucket (frozen copy of rollups.fold_observation)"""
+    rollup.count += 1
+    rollup.temp_sum += record.temperature
+    rollup.temp_min = record.temperature if rollup.temp_min is None else min(rollup.temp_min, record.temperature)
+    rollup.temp_max = record.temperature if rollup.temp_max is None else max(rollup.temp_max, record.temperature)
+    rollup.humidity_sum += record.humidity
+    rollup.pressure_sum += record.pressure
+    rollup.wind_sum += record.wind_speed
+    rollup.wind_max = record.wind_speed if rollup.wind_max is None else max(rollup.wind_max, record.wind_speed)
+    rollup.condition_counts[record.weather_main] = rollup.condition_counts.get(record.weather_main, 0) + 1
+    rollup.weather_main = max(rollup.condition_counts, key=rollup.condition_counts.get)
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Roll up the history stored before rollups existed, one city at a time,
+    reading raw rows in primary key chunks. Uses only historical models so
+    later changes to the app code cannot break this migration.
+    """
+    WeatherData = apps.get_model('WEATHERAPP', 'WeatherData')
+    rollups = [
+        (apps.get_model('WEATHERAPP', 'HourlyWeatherRollup'), hour_bucket),
+        (apps.get_model('WEATHERAPP', 'DailyWeatherRollup'), day_bucket),
+    ]
+    city_ids = WeatherData.objects.order_by('city_id').values_list('city_id', flat=True).distinct()
+    for city_id in list(city_ids):
+        for model, _ in rollups:
+            model.objects.filter(city_id=city_id).delete()
+        buckets = {model: {} for model, _ in rollups}
+        records = WeatherData.objects.filter(city_id=city_id).order_by('pk')
+        last_pk = 0
+        while True:
+            chunk = list(records.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+            if not chunk:
+                break
+            for record in chunk:
+                for model, bucket_for in rollups:
+                    bucket = bucket_for(record.timestamp)
+                    rollup = buckets[model].get(bucket)
+                    if rollup is None:
+                        rollup = buckets[model][bucket] = model(city_id=city_id, bucket=bucket)
+                    fold(rollup, record)
+            last_pk = chunk[-1].pk
+        for model, _ in rollups:
+            model.objects.bulk_create(buckets[model].values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WEATHERAPP', '0005_latestweather'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyWeatherRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('temp_sum', models.FloatField(default=0)),
+                ('temp_min', models.FloatField(blank=True, null=True)),
+                ('temp_max', models.FloatField(blank=True, null=True)),
+                ('humidity_sum', models.FloatField(default=0)),
+                ('pressure_sum', models.FloatField(default=0)),
+                ('wind_sum', models.FloatField(default=0)),
+                ('wind_max', models.FloatField(blank=True, null=True)),
+                ('condition_counts', models.JSONField(default=dict)),
+                ('weather_main', models.CharField(blank=True, max_length=100)),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rollups', to='WEATHERAPP.city')),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyWeatherRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('temp_sum', models.FloatField(default=0)),
+                ('temp_min', models.FloatField(blank=True, null=True)),
+                ('temp_max', models.FloatField(blank=True, null=True)),
+                ('humidity_sum', models.FloatField(default=0)),
+                ('pressure_sum', models.FloatField(default=0)),
+                ('wind_sum', models.FloatField(default=0)),
+                ('wind_max', models.FloatField(blank=True, null=True)),
+                ('condition_counts', models.JSONField(default=dict)),
+                ('weather_main', models.CharField(blank=True, max_length=100)),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='WEATHERAPP.city')),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='hourlyweatherrollup',
+            constraint=models.UniqueConstraint(fields=('city', 'bucket'), name='hourly_rollup_city_bucket_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyweatherrollup',
+            constraint=models.UniqueConstraint(fields=('city', 'bucket'), name='daily_rollup_city_bucket_uniq'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
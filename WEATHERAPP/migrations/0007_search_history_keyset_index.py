@@ -0,0 +1,21 @@
+# Generated by Django 4.2.28 on 2026-10-17 07:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WEATHERAPP', '0006_weather_rollups'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='searchhistory',
+            name='search_searched_at_idx',
+        ),
+        migrations.AddIndex(
+            model_name='searchhistory',
+            index=models.Index(fields=['-searched_at', '-id'], name='search_searched_at_id_idx'),
+        ),
+    ]
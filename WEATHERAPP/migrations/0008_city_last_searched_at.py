@@ -0,0 +1,34 @@
+# Generated by Django 4.2.28 on 2026-10-17 07:52
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_last_searched_at(apps, schema_editor):
+    """Stamp each city with its newest SearchHistory row, in one UPDATE"""
+    City = apps.get_model('WEATHERAPP', 'City')
+    SearchHistory = apps.get_model('WEATHERAPP', 'SearchHistory')
+    
+    City.objects.update(last_searched_at=Subquery(
+        SearchHistory.objects.filter(city=OuterRef('pk')).order_by('-searched_at').values('searched_at')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WEATHERAPP', '0007_search_history_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='city',
+            name='last_searched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='city',
+            index=models.Index(fields=['-last_searched_at', '-id'], name='city_last_searched_idx'),
+        ),
+        migrations.RunPython(backfill_last_searched_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.28 on 2026-10-17 07:54
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def backfill_search_count(apps, schema_editor):
+    """Count each city's existing SearchHistory rows, in one UPDATE"""
+    City = apps.get_model('WEATHERAPP', 'City')
+    SearchHistory = apps.get_model('WEATHERAPP', 'SearchHistory')
+    
+    City.objects.update(search_count=Coalesce(Subquery(
+        SearchHistory.objects.filter(city=OuterRef('pk')).order_by()
+        .values('city').annotate(count=Count('id')).values('count')
+    ), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WEATHERAPP', '0008_city_last_searched_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='city',
+            name='search_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='searchhistory',
+            name='searched_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_search_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.28 on 2026-10-17 08:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WEATHERAPP', '0009_buffered_search_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='city',
+            name='owm_id',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -1,14 +1,23 @@
 from django.db import models
+from django.utils import timezone
 
 class City(models.Model):
     name = models.CharField(max_length=100, unique=True)
     country = models.CharField(max_length=100, blank=True)
     latitude = models.FloatField(blank=True, null=True)
     longitude = models.FloatField(blank=True, null=True)
+    owm_id = models.PositiveBigIntegerField(blank=True, null=True, db_index=True)  # OpenWeatherMap city id
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # last edit to name, country, coordinates or ids
+    last_searched_at = models.DateTimeField(blank=True, null=True)  # maintained by searches.write_searches
+    search_count = models.PositiveIntegerField(default=0)
     
     class Meta:
         verbose_name_plural = "Cities"
+        indexes = [
+            # Recently searched cities, newest first (keyset on last_searched_at, id)
+            models.Index(fields=['-last_searched_at', '-id'], name='city_last_searched_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name}, {self.country}"
@@ -38,19 +47,143 @@ class WeatherData(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Latest N observations for one city (detail page, history)
+            models.Index(fields=['city', '-timestamp'], name='weather_city_timestamp_idx'),
+            models.Index(fields=['-timestamp'], name='weather_timestamp_idx'),
+        ]
     
     def __str__(self):
         return f"{self.city.name} - {self.timestamp}"
 
 
+class LatestWeather(models.Model):
+    """Most recent observation per city, kept in sync by the ingestion write path"""
+    city = models.OneToOneField(City, on_delete=models.CASCADE, primary_key=True, related_name='latest_weather')
+    temperature = models.FloatField()
+    feels_like = models.FloatField(blank=True, null=True)
+    temp_min = models.FloatField(blank=True, null=True)
+    temp_max = models.FloatField(blank=True, null=True)
+    humidity = models.IntegerField()
+    pressure = models.IntegerField()
+    weather_main = models.CharField(max_length=100)
+    weather_description = models.CharField(max_length=255)
+    wind_speed = models.FloatField()
+    wind_deg = models.FloatField(blank=True, null=True)
+    wind_gust = models.FloatField(blank=True, null=True)
+    cloudiness = models.IntegerField()
+    visibility = models.IntegerField(blank=True, null=True)
+    sunrise = models.IntegerField(blank=True, null=True)
+    sunset = models.IntegerField(blank=True, null=True)
+    observed_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name_plural = "Latest Weather"
+    
+    def __str__(self):
+        return f"{self.city.name} - {self.observed_at}"
+    
+    def as_dict(self):
+        """Current conditions in the shape the weather card templates expect"""
+        return {
+            'temperature': self.temperature,
+            'feels_like': self.feels_like,
+            'temp_min': self.temp_min,
+            'temp_max': self.temp_max,
+            'humidity': self.humidity,
+            'description': self.weather_description.title(),
+            'main': self.weather_main,
+            'wind_speed': self.wind_speed,
+            'wind_deg': self.wind_deg,
+            'wind_gust': self.wind_gust,
+            'pressure': self.pressure,
+            'cloudiness': self.cloudiness,
+            'visibility': self.visibility,
+            'sunrise': self.sunrise,
+            'sunset': self.sunset,
+            'country': self.city.country,
+            'coords': {
+                'lat': self.city.latitude,
+                'lon': self.city.longitude
+            },
+            'observed_at': self.observed_at,
+        }
+
+
+class WeatherRollup(models.Model):
+    """
+    Aggregated observations for one city over one time bucket.
+    Sums are stored (not means) so rollups can be updated incrementally.
+    """
+    bucket = models.DateTimeField()  # Start of the bucket (UTC)
+    count = models.IntegerField(default=0)
+    temp_sum = models.FloatField(default=0)
+    temp_min = models.FloatField(blank=True, null=True)
+    temp_max = models.FloatField(blank=True, null=True)
+    humidity_sum = models.FloatField(default=0)
+    pressure_sum = models.FloatField(default=0)
+    wind_sum = models.FloatField(default=0)
+    wind_max = models.FloatField(blank=True, null=True)
+    condition_counts = models.JSONField(default=dict)  # e.g. {"Clouds": 3, "Rain": 1}
+    weather_main = models.CharField(max_length=100, blank=True)  # Dominant condition
+    
+    class Meta:
+        abstract = True
+        ordering = ['-bucket']
+    
+    def __str__(self):
+        return f"{self.city.name} - {self.bucket}"
+    
+    @property
+    def temp_mean(self):
+        return self.temp_sum / self.count if self.count else None
+    
+    @property
+    def humidity_mean(self):
+        return self.humidity_sum / self.count if self.count else None
+    
+    @property
+    def pressure_mean(self):
+        return self.pressure_sum / self.count if self.count else None
+    
+    @property
+    def wind_mean(self):
+        return self.wind_sum / self.count if self.count else None
+
+
+class HourlyWeatherRollup(WeatherRollup):
+    """Per-city hourly aggregate of WeatherData"""
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='hourly_rollups')
+    
+    class Meta(WeatherRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'bucket'], name='hourly_rollup_city_bucket_uniq'),
+        ]
+
+
+class DailyWeatherRollup(WeatherRollup):
+    """Per-city daily (UTC) aggregate of WeatherData"""
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='daily_rollups')
+    
+    class Meta(WeatherRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'bucket'], name='daily_rollup_city_bucket_uniq'),
+        ]
+
+
 class SearchHistory(models.Model):
     """Model to track searched cities"""
     city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='search_records')
-    searched_at = models.DateTimeField(auto_now_add=True)
+    searched_at = models.DateTimeField(default=timezone.now)  # set explicitly by buffered writes
     
     class Meta:
         ordering = ['-searched_at']
         verbose_name_plural = "Search Histories"
+        indexes = [
+            # Keyset pagination of the search history (searched_at, id)
+            models.Index(fields=['-searched_at', '-id'], name='search_searched_at_id_idx'),
+            models.Index(fields=['city', '-searched_at'], name='search_city_searched_at_idx'),
+        ]
     
     def __str__(self):
         return f"{self.city.name} - {self.searched_at}"
@@ -63,6 +196,9 @@ class Favorite(models.Model):
     
     class Meta:
         ordering = ['-added_at']
+        indexes = [
+            models.Index(fields=['-added_at'], name='favorite_added_at_idx'),
+        ]
     
     def __str__(self):
         return f"Favorite: {self.city.name}"
@@ -0,0 +1,156 @@
+"""
+Keyset (cursor) pagination for list views.
+
+Offset pagination needs a COUNT(*) and scans past every skipped row, so deep
+pages get slower as the table grows. Here a page is the next page_size rows
+after (or before) the last row seen, in a fixed unique ordering such as
+('-searched_at', '-id'). With an index on those columns every page is a
+bounded index range read, whatever its depth.
+
+The cursor is an opaque token in ?cursor= holding the boundary row's values
+and the direction.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+CURSOR_PARAM = 'cursor'
+
+
+def encode_cursor(position, reverse=False):
+    payload = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (position, reverse); raises ValueError for malformed cursors"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        position, reverse = payload['p'], bool(payload['r'])
+    except (TypeError, KeyError, ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+    if position is not None and not isinstance(position, list):
+        raise ValueError('Invalid cursor')
+    return position, reverse
+
+
+class KeysetPage:
+    """The subset of Django's Page API the list templates use, plus cursors"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, first_cursor, last_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.first_cursor = first_cursor
+        self.last_cursor = last_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by `ordering`, a tuple of field names (with '-' for
+    descending) whose last field is unique, e.g. ('name', 'id').
+    """
+
+    def __init__(self, queryset, page_size, ordering):
+        self.queryset = queryset
+        self.page_size = page_size
+        self.ordering = ordering
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+    def _filter_after(self, position, reverse):
+        """
+        Q for rows strictly after `position` in the ordering (before it when
+        reverse), expanded as (a > x) OR (a = x AND b > y) ...
+        """
+        condition = Q()
+        for index in reversed(range(len(self.fields))):
+            name, descending = self.fields[index]
+            lookup = 'lt' if descending != reverse else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[index]})
+            if index < len(self.fields) - 1:
+                step |= Q(**{name: position[index]}) & condition
+            condition = step
+        return condition
+
+    def _to_python(self, position):
+        model = self.queryset.model
+        if len(position) != len(self.fields):
+            raise ValueError('Invalid cursor')
+        try:
+            return [
+                model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, position)
+            ]
+        except (ValidationError, ValueError):
+            raise ValueError('Invalid cursor')
+
+    def _position_of(self, obj):
+        """JSON-safe ordering values of a row"""
+        position = []
+        for name, _ in self.fields:
+            value = getattr(obj, self.queryset.model._meta.get_field(name).attname)
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return position
+
+    def page(self, cursor=None):
+        """Return the KeysetPage for a cursor token (None for the first page)"""
+        position, reverse = decode_cursor(cursor) if cursor else (None, False)
+        ordering = self.ordering
+        if reverse:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+
+        queryset = self.queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._filter_after(self._to_python(position), reverse))
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Moving forward we came from the previous page (if any cursor); moving
+        # backward we came from the next page, unless we jumped to the end
+        has_next = has_more if not reverse else position is not None
+        has_previous = position is not None if not reverse else has_more
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(self._position_of(rows[-1])) if has_next and rows else None,
+            previous_cursor=encode_cursor(self._position_of(rows[0]), reverse=True) if has_previous and rows else None,
+            first_cursor=encode_cursor(None),
+            last_cursor=encode_cursor(None, reverse=True),
+        )
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin replacing offset pagination with KeysetPaginator.
+    Set paginate_by and keyset_ordering; templates get page_obj with
+    next_cursor/previous_cursor/first_cursor/last_cursor.
+    """
+    keyset_ordering = ('id',)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(CURSOR_PARAM))
+        except ValueError:
+            raise Http404('Invalid cursor')
+        return paginator, page, page.object_list, page.has_other_pages()
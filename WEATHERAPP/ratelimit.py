@@ -0,0 +1,66 @@
+"""
+Client-side rate limiting for OpenWeatherMap calls.
+"""
+import threading
+import time
+
+RATE_PERIODS = {
+    's': 1, 'sec': 1, 'second': 1,
+    'm': 60, 'min': 60, 'minute': 60,
+    'h': 3600, 'hour': 3600,
+}
+
+
+def parse_rate(rate):
+    """
+    Parse a rate such as '60/min' or '2/s' into (calls, seconds).
+    Raises ValueError for malformed values.
+    """
+    try:
+        calls, period = rate.split('/')
+        calls = int(calls)
+        seconds = RATE_PERIODS[period.strip().lower()]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate '{rate}', expected e.g. '60/min'")
+    if calls <= 0:
+        raise ValueError(f"Invalid rate '{rate}', calls must be positive")
+    return calls, seconds
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Tokens refill continuously at calls/seconds
+    and at most `capacity` can accumulate, which bounds the burst size. The
+    default capacity of 1 spaces calls evenly, so no window of the period
+    ever sees more than `calls` calls.
+    """
+
+    def __init__(self, calls, seconds, capacity=1):
+        if capacity < 1:
+            raise ValueError('Burst capacity must be at least 1')
+        self.rate = calls / seconds
+        self.capacity = capacity
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_string(cls, rate, capacity=1):
+        calls, seconds = parse_rate(rate)
+        return cls(calls, seconds, capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,129 @@
+"""
+Retention policy for stored weather observations.
+
+Raw WeatherData is downsampled into hourly and daily rollups at ingestion
+(see rollups.py), so once a raw row is older than the raw retention window
+only its aggregates are kept. Raw rows that were never rolled up (older
+than their city's oldest hourly bucket, e.g. history stored before rollups
+existed) are never pruned; run backfill_rollups first. The policy comes
+from settings.WEATHER_RETENTION_DAYS; None keeps a tier forever.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import DailyWeatherRollup, HourlyWeatherRollup, WeatherData
+
+DEFAULT_RETENTION_DAYS = {
+    'raw': 7,
+    'hourly': 90,
+    'daily': None,
+}
+
+# tier -> (model, timestamp field)
+RETENTION_TIERS = {
+    'raw': (WeatherData, 'timestamp'),
+    'hourly': (HourlyWeatherRollup, 'bucket'),
+    'daily': (DailyWeatherRollup, 'bucket'),
+}
+
+
+def get_retention_days():
+    """Return the effective policy, validating that coarser tiers outlive finer ones"""
+    policy = {**DEFAULT_RETENTION_DAYS, **getattr(settings, 'WEATHER_RETENTION_DAYS', {})}
+    previous = 0
+    for tier in ('raw', 'hourly', 'daily'):
+        days = policy[tier]
+        if days is not None and (days < previous or days <= 0):
+            raise ValueError(
+                f"Retention for '{tier}' ({days} days) must be positive and at least "
+                f"as long as the finer tiers"
+            )
+        previous = float('inf') if days is None else days
+    return policy
+
+
+def unrolled_raw_rows():
+    """Raw rows not covered by rollups: older than their city's oldest hourly bucket"""
+    oldest_bucket = (
+        HourlyWeatherRollup.objects.filter(city_id=OuterRef('city_id'))
+        .order_by().values('city_id').annotate(oldest=Min('bucket')).values('oldest')
+    )
+    covered_from = Subquery(oldest_bucket)
+    return WeatherData.objects.annotate(covered_from=covered_from).filter(
+        Q(covered_from__isnull=True) | Q(timestamp__lt=covered_from)
+    )
+
+
+def rollup_coverage():
+    """{city_id: oldest hourly bucket}; a city's raw rows from then on are rolled up"""
+    return dict(HourlyWeatherRollup.objects.order_by().values_list('city_id').annotate(Min('bucket')))
+
+
+def prune_tier(tier, days, chunk_size=1000, now=None, dry_run=False):
+    """
+    Delete rows of a tier older than `days`, chunk_size rows per transaction
+    so SQLite never holds the write lock for one giant DELETE. Raw rows not
+    yet rolled up are kept (see unrolled_raw_rows): each city's coverage is
+    read once up front and every chunk is checked against it.
+    Returns the number of rows deleted (or that would be deleted).
+    """
+    if days is None:
+        return 0
+    model, field = RETENTION_TIERS[tier]
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    expired = model.objects.filter(**{f'{field}__lt': cutoff}).order_by('pk')
+    if tier != 'raw':
+        if dry_run:
+            return expired.count()
+        return _delete_chunks(model, expired.values_list('pk', flat=True), chunk_size)
+
+    coverage = rollup_coverage()
+    rows = expired.filter(city_id__in=list(coverage)).values_list('pk', 'city_id', 'timestamp')
+    total = 0
+    last_pk = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return total
+        last_pk = chunk[-1][0]
+        pks = [pk for pk, city_id, timestamp in chunk if timestamp >= coverage[city_id]]
+        if pks and not dry_run:
+            with transaction.atomic():
+                model.objects.filter(pk__in=pks).delete()
+        total += len(pks)
+
+
+def _delete_chunks(model, pks_query, chunk_size):
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            pks = list(pks_query[:chunk_size])
+            if not pks:
+                return deleted
+            model.objects.filter(pk__in=pks).delete()
+        deleted += len(pks)
+
+
+def database_size():
+    """
+    Return (allocated bytes, free bytes) for SQLite databases, or None for
+    other backends
+    """
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        page_size = cursor.execute('PRAGMA page_size').fetchone()[0]
+        page_count = cursor.execute('PRAGMA page_count').fetchone()[0]
+        freelist_count = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+    return page_count * page_size, freelist_count * page_size
+
+
+def vacuum():
+    """Return free pages to the filesystem (SQLite only)"""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
@@ -0,0 +1,121 @@
+"""
+Hourly and daily rollups of WeatherData.
+
+apply_rollups() folds a batch of saved WeatherData records into the
+HourlyWeatherRollup and DailyWeatherRollup tables. WeatherDataWriter calls
+it on every flush, and rebuild_rollups() (the backfill_rollups command)
+rebuilds the tables from raw rows.
+"""
+from django.db.models import Min
+
+from .models import DailyWeatherRollup, HourlyWeatherRollup, WeatherData
+
+ROLLUP_UPDATE_FIELDS = [
+    'count', 'temp_sum', 'temp_min', 'temp_max', 'humidity_sum', 'pressure_sum',
+    'wind_sum', 'wind_max', 'condition_counts', 'weather_main',
+]
+
+
+def hour_bucket(timestamp):
+    """Start of the hour containing timestamp"""
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(timestamp):
+    """Start of the (UTC) day containing timestamp"""
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# (rollup model, bucket function) pairs maintained at ingestion
+ROLLUPS = [
+    (HourlyWeatherRollup, hour_bucket),
+    (DailyWeatherRollup, day_bucket),
+]
+
+
+def fold_observation(rollup, record):
+    """Fold one WeatherData record into a rollup bucket"""
+    rollup.count += 1
+    rollup.temp_sum += record.temperature
+    rollup.temp_min = record.temperature if rollup.temp_min is None else min(rollup.temp_min, record.temperature)
+    rollup.temp_max = record.temperature if rollup.temp_max is None else max(rollup.temp_max, record.temperature)
+    rollup.humidity_sum += record.humidity
+    rollup.pressure_sum += record.pressure
+    rollup.wind_sum += record.wind_speed
+    rollup.wind_max = record.wind_speed if rollup.wind_max is None else max(rollup.wind_max, record.wind_speed)
+    rollup.condition_counts[record.weather_main] = rollup.condition_counts.get(record.weather_main, 0) + 1
+    rollup.weather_main = max(rollup.condition_counts, key=rollup.condition_counts.get)
+
+
+def apply_rollups(records, batch_size=500, rollups=ROLLUPS):
+    """
+    Fold saved WeatherData records into every rollup table.
+    Costs one SELECT plus at most one INSERT and one UPDATE per table.
+    """
+    if not records:
+        return
+    for model, bucket_for in rollups:
+        keys = {(record.city_id, bucket_for(record.timestamp)) for record in records}
+        existing = {
+            (rollup.city_id, rollup.bucket): rollup
+            for rollup in model.objects.filter(
+                city_id__in={city_id for city_id, _ in keys},
+                bucket__in={bucket for _, bucket in keys},
+            )
+        }
+
+        created = {}
+        for record in records:
+            key = (record.city_id, bucket_for(record.timestamp))
+            rollup = existing.get(key) or created.get(key)
+            if rollup is None:
+                rollup = created[key] = model(city_id=record.city_id, bucket=key[1])
+            fold_observation(rollup, record)
+
+        updated = [rollup for key, rollup in existing.items() if key in keys]
+        if created:
+            model.objects.bulk_create(created.values(), batch_size=batch_size)
+        if updated:
+            model.objects.bulk_update(updated, ROLLUP_UPDATE_FIELDS, batch_size=batch_size)
+
+
+def rebuild_rollups(city_id, chunk_size=2000, rollups=ROLLUPS):
+    """
+    Rebuild one city's rollups from its raw rows. Returns the number of raw
+    rows folded.
+
+    Only buckets whose raw rows all still exist are rebuilt. A bucket that
+    starts before the oldest raw row lost rows to pruning, so if it exists
+    it is kept as is and its remaining rows are not folded again; older
+    buckets are not touched at all.
+    """
+    records = WeatherData.objects.filter(city_id=city_id).order_by('pk')
+    oldest = records.aggregate(oldest=Min('timestamp'))['oldest']
+    if oldest is None:
+        return 0
+
+    kept = {}
+    for model, bucket_for in rollups:
+        first = bucket_for(oldest)
+        buckets = model.objects.filter(city_id=city_id)
+        if first < oldest and buckets.filter(bucket=first).exists():
+            kept[model] = first
+            buckets = buckets.filter(bucket__gt=first)
+        else:
+            buckets = buckets.filter(bucket__gte=first)
+        buckets.delete()
+
+    # Walk raw rows by primary key so each chunk is an index range read
+    folded = 0
+    last_pk = 0
+    while True:
+        chunk = list(records.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return folded
+        for model, bucket_for in rollups:
+            apply_rollups(
+                [record for record in chunk if bucket_for(record.timestamp) != kept.get(model)],
+                rollups=[(model, bucket_for)],
+            )
+        folded += len(chunk)
+        last_pk = chunk[-1].pk
@@ -0,0 +1,159 @@
+"""
+Long-running refresh scheduler (see the run_weather_scheduler command).
+
+Every City gets its own cadence: favorites and recently searched cities
+are refreshed more often than the rest. Due times live in a min-heap, and
+cities that join the schedule together are spread evenly over their
+interval instead of being refreshed in one burst. At most max_in_flight
+refreshes are submitted at a time; when refreshes fall behind (e.g. under a
+tight rate limit) due cities wait in the heap instead of piling up in the
+executor's queue.
+"""
+import heapq
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import City, Favorite
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEDULER = {
+    'FAVORITE_INTERVAL': 15 * 60,  # seconds between refreshes of a favorite
+    'RECENT_INTERVAL': 30 * 60,  # ... of a city searched within RECENT_WINDOW
+    'DEFAULT_INTERVAL': 60 * 60,  # ... of any other city
+    'RECENT_WINDOW': 24 * 60 * 60,
+    'SYNC_INTERVAL': 5 * 60,  # how often the city list and priorities are reloaded
+}
+
+
+def get_scheduler_options():
+    return {**DEFAULT_SCHEDULER, **getattr(settings, 'WEATHER_SCHEDULER', {})}
+
+
+class RefreshScheduler:
+    """
+    Priority queue of next-due refresh times per city.
+    Times are in clock() seconds (time.monotonic by default).
+    """
+
+    def __init__(self, options=None, clock=time.monotonic):
+        self.options = options or get_scheduler_options()
+        self.clock = clock
+        self._heap = []  # (due, city_id)
+        self._due = {}  # city_id -> due; heap entries not matching are stale
+        self._intervals = {}  # city_id -> cadence in seconds
+
+    def __len__(self):
+        return len(self._due)
+
+    def interval_for(self, city_id, favorite_ids, recent_ids):
+        if city_id in favorite_ids:
+            return self.options['FAVORITE_INTERVAL']
+        if city_id in recent_ids:
+            return self.options['RECENT_INTERVAL']
+        return self.options['DEFAULT_INTERVAL']
+
+    def sync(self, now=None):
+        """
+        Reload cities and their priorities. New cities are spread evenly over
+        their interval, removed cities are dropped, and cadence changes apply
+        from the next refresh (or sooner if the new cadence is shorter).
+        """
+        now = self.clock() if now is None else now
+        city_ids = set(City.objects.values_list('id', flat=True))
+        favorite_ids = set(Favorite.objects.values_list('city_id', flat=True))
+        recent_since = timezone.now() - timedelta(seconds=self.options['RECENT_WINDOW'])
+        recent_ids = set(
+            City.objects.filter(last_searched_at__gte=recent_since).values_list('id', flat=True)
+        )
+
+        for city_id in set(self._due) - city_ids:
+            del self._due[city_id]
+            del self._intervals[city_id]
+
+        new_by_interval = {}
+        for city_id in sorted(city_ids):
+            interval = self.interval_for(city_id, favorite_ids, recent_ids)
+            if city_id not in self._due:
+                new_by_interval.setdefault(interval, []).append(city_id)
+            elif interval < self._intervals[city_id]:
+                # Promoted (e.g. just favorited): don't wait out the old cadence
+                self._schedule(city_id, min(self._due[city_id], now + interval))
+            self._intervals[city_id] = interval
+
+        for interval, new_ids in new_by_interval.items():
+            step = interval / len(new_ids)
+            for index, city_id in enumerate(new_ids):
+                self._schedule(city_id, now + index * step)
+
+    def _schedule(self, city_id, due):
+        self._due[city_id] = due
+        heapq.heappush(self._heap, (due, city_id))
+
+    def pop_due(self, now=None, limit=None):
+        """Remove and return the ids of the cities due at `now` (at most `limit`)"""
+        now = self.clock() if now is None else now
+        due_ids = []
+        while self._heap and self._heap[0][0] <= now and (limit is None or len(due_ids) < limit):
+            due, city_id = heapq.heappop(self._heap)
+            if self._due.get(city_id) == due:
+                del self._due[city_id]
+                due_ids.append(city_id)
+        return due_ids
+
+    def reschedule(self, city_id, now=None):
+        """Schedule the next refresh one interval after `now`"""
+        if city_id not in self._intervals:
+            return
+        now = self.clock() if now is None else now
+        self._schedule(city_id, now + self._intervals[city_id])
+
+    def next_due(self):
+        """Earliest due time, or None when nothing is scheduled"""
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def run(self, refresh, executor, stop_event, max_sleep=60, max_in_flight=None, poll_interval=0.5):
+        """
+        Submit due refreshes to the executor until stop_event is set, keeping
+        at most max_in_flight of them outstanding (unbounded when None).
+        refresh(city_id) is called in a worker thread.
+        """
+        next_sync = self.clock()
+        in_flight = set()
+        while not stop_event.is_set():
+            now = self.clock()
+            if now >= next_sync:
+                self.sync(now)
+                next_sync = now + self.options['SYNC_INTERVAL']
+
+            in_flight = {future for future in in_flight if not future.done()}
+            free = None if max_in_flight is None else max_in_flight - len(in_flight)
+            for city_id in self.pop_due(now, limit=free):
+                in_flight.add(executor.submit(self._run_refresh, refresh, city_id))
+                self.reschedule(city_id, now)
+
+            if free is not None and len(in_flight) >= max_in_flight:
+                # Saturated: wait for a slot, checking for stop regularly
+                wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                continue
+
+            next_due = self.next_due()
+            wake_at = next_sync if next_due is None else min(next_sync, next_due)
+            stop_event.wait(min(max(wake_at - self.clock(), 0), max_sleep))
+
+    @staticmethod
+    def _run_refresh(refresh, city_id):
+        try:
+            refresh(city_id)
+        except Exception:
+            logger.exception('Scheduled refresh of city %s failed', city_id)
+        finally:
+            close_old_connections()
@@ -0,0 +1,139 @@
+"""
+Search history writes.
+
+Every search is logged as a SearchHistory row and also counted and stamped
+on its City (search_count, last_searched_at), so "recently searched cities"
+is an index read on City instead of a de-duplication over the whole history.
+
+The search view does not write these itself: it adds an event to a
+SearchBuffer, which flushes batches in the background (every FLUSH_INTERVAL
+seconds, or as soon as MAX_EVENTS are pending). A flush is one bulk INSERT
+plus one F() counter UPDATE per searched city, instead of an INSERT and an
+UPDATE per search. Pending events are also flushed when the process exits
+(see close()). Settings come from settings.WEATHER_SEARCH_BUFFER.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import City, SearchHistory
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_BUFFER = {
+    'MAX_EVENTS': 200,  # flush as soon as this many searches are pending
+    'FLUSH_INTERVAL': 5,  # seconds between periodic flushes (None disables the timer)
+}
+
+
+def get_search_buffer_options():
+    return {**DEFAULT_SEARCH_BUFFER, **getattr(settings, 'WEATHER_SEARCH_BUFFER', {})}
+
+
+def write_searches(events, batch_size=500):
+    """
+    Persist (city_id, searched_at) events. Events for cities deleted in the
+    meantime are dropped. Returns the number of SearchHistory rows written.
+    """
+    per_city = {}
+    for city_id, searched_at in events:
+        count, newest = per_city.get(city_id, (0, searched_at))
+        per_city[city_id] = (count + 1, max(newest, searched_at))
+    if not per_city:
+        return 0
+
+    with transaction.atomic():
+        existing = set(City.objects.filter(pk__in=per_city).values_list('pk', flat=True))
+        records = SearchHistory.objects.bulk_create(
+            [SearchHistory(city_id=city_id, searched_at=searched_at)
+             for city_id, searched_at in events if city_id in existing],
+            batch_size=batch_size,
+        )
+        for city_id in existing:
+            count, newest = per_city[city_id]
+            City.objects.filter(pk=city_id).update(
+                search_count=F('search_count') + count,
+                # Buffers in other processes may flush out of order
+                last_searched_at=Greatest(Coalesce('last_searched_at', Value(newest)), Value(newest)),
+            )
+    return len(records)
+
+
+def record_search(city):
+    """Log a search for city immediately (bypassing the buffer)"""
+    searched_at = timezone.now()
+    write_searches([(city.pk, searched_at)])
+    city.last_searched_at = searched_at
+
+
+class SearchBuffer:
+    """
+    In-process buffer of search events. Thread-safe; register close() with
+    atexit so a normal exit (e.g. a worker recycle) writes pending events.
+    Events still pending when the process is killed are lost, which only
+    under-counts history.
+    """
+
+    def __init__(self, executor, options=None):
+        self.executor = executor
+        self.options = options
+        self._events = []
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def get_options(self):
+        return self.options or get_search_buffer_options()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._events)
+
+    def add(self, city_id, searched_at=None):
+        """Queue a search; triggers a background flush when the buffer is full"""
+        options = self.get_options()
+        with self._lock:
+            self._events.append((city_id, searched_at or timezone.now()))
+            full = len(self._events) >= options['MAX_EVENTS']
+            if options['FLUSH_INTERVAL'] and self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_periodically, name='search-flush', daemon=True,
+                )
+                self._flusher.start()
+        if full:
+            self.executor.submit(self._flush_in_worker)
+
+    def flush(self):
+        """Write all pending events; on failure they are re-queued. Returns rows written."""
+        with self._lock:
+            events, self._events = self._events, []
+        if not events:
+            return 0
+        try:
+            return write_searches(events)
+        except Exception:
+            with self._lock:
+                self._events[:0] = events
+            raise
+
+    def close(self):
+        """Write pending events before the process exits"""
+        self._flush_in_worker()
+
+    def _flush_in_worker(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Flushing %s buffered searches failed', len(self))
+        finally:
+            close_old_connections()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.get_options()['FLUSH_INTERVAL'] or 1)
+            self._flush_in_worker()
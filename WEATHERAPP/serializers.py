@@ -0,0 +1,68 @@
+from rest_framework import serializers
+
+from .models import LatestWeather, WeatherData
+
+
+class CurrentWeatherSerializer(serializers.ModelSerializer):
+    """Latest stored observation of a city"""
+    city = serializers.IntegerField(source='city_id')
+    name = serializers.CharField(source='city.name')
+    country = serializers.CharField(source='city.country')
+    latitude = serializers.FloatField(source='city.latitude')
+    longitude = serializers.FloatField(source='city.longitude')
+
+    class Meta:
+        model = LatestWeather
+        fields = [
+            'city', 'name', 'country', 'latitude', 'longitude', 'observed_at',
+            'temperature', 'feels_like', 'temp_min', 'temp_max', 'humidity', 'pressure',
+            'weather_main', 'weather_description', 'wind_speed', 'wind_deg', 'wind_gust',
+            'cloudiness', 'visibility', 'sunrise', 'sunset',
+        ]
+
+
+class WeatherHistorySerializer(serializers.ModelSerializer):
+    """One raw observation from a city's history"""
+
+    class Meta:
+        model = WeatherData
+        fields = [
+            'id', 'timestamp', 'temperature', 'feels_like', 'temp_min', 'temp_max',
+            'humidity', 'pressure', 'weather_main', 'weather_description', 'wind_speed',
+            'wind_deg', 'wind_gust', 'cloudiness', 'visibility', 'uvi', 'aqi',
+            'rain_probability',
+        ]
+
+
+class DailyForecastSerializer(serializers.Serializer):
+    """One entry of parse_forecast()['daily']"""
+    dt = serializers.IntegerField()
+    temperature = serializers.FloatField()
+    temp_min = serializers.FloatField()
+    temp_max = serializers.FloatField()
+    humidity = serializers.IntegerField()
+    pressure = serializers.IntegerField()
+    description = serializers.CharField()
+    main = serializers.CharField()
+    wind_speed = serializers.FloatField()
+    cloudiness = serializers.IntegerField()
+    rain = serializers.FloatField()
+
+
+class HourlyForecastSerializer(serializers.Serializer):
+    """One entry of parse_forecast()['hourly']"""
+    time = serializers.CharField()
+    hour = serializers.IntegerField()
+    temperature = serializers.FloatField()
+    feels_like = serializers.FloatField(allow_null=True)
+    humidity = serializers.IntegerField()
+    description = serializers.CharField()
+    main = serializers.CharField()
+    wind_speed = serializers.FloatField()
+    rain_prob = serializers.FloatField()
+    cloudiness = serializers.IntegerField()
+
+
+class ForecastSerializer(serializers.Serializer):
+    daily = DailyForecastSerializer(many=True)
+    hourly = HourlyForecastSerializer(many=True)
@@ -1,9 +1,85 @@
+import importlib
 import json
-from django.test import TestCase, Client
-from django.urls import reverse
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import requests
+from django.apps import apps
 from django.contrib.auth.models import User
-from .models import City, WeatherData
-from datetime import datetime
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import views
+from .benchmarks import BenchmarkFixture, compare, run_benchmarks
+from .cache import (
+    LRULocMemCache,
+    SingleFlight,
+    cache_stats,
+    cached_json,
+    cached_json_many,
+    make_cache_key,
+    refresh_json,
+    store_json_many,
+)
+from .fakeowm import FakeOWMServer, fake_weather
+from .forms import CityForm, SearchWeatherForm
+from .freshness import FRESH, STALE, BackgroundRefresher
+from .http_client import CappedRetry, background_calls, get_json, get_session, reset_session
+from .ingest import WeatherDataWriter, record_weather, weather_record_from_payload
+from .loadtest import percentile, run_load
+from .models import (
+    City,
+    DailyWeatherRollup,
+    Favorite,
+    HourlyWeatherRollup,
+    LatestWeather,
+    SearchHistory,
+    WeatherData,
+)
+from .ratelimit import TokenBucket, parse_rate
+from .retention import get_retention_days, prune_tier
+from .rollups import day_bucket, hour_bucket
+from .scheduler import RefreshScheduler
+from .searches import SearchBuffer, record_search, write_searches
+from .urls import urlpatterns
+from .views import (
+    GROUP_URL,
+    city_detail_validators,
+    get_aqi_data,
+    get_bulk_weather_data,
+    get_forecast,
+    get_uvi_data,
+    get_weather_data,
+    location_params,
+    map_concurrently,
+    parse_forecast,
+    point_params,
+)
+
+
+def owm_payload(temp=10.0, humidity=50, pressure=1010, condition='Clear', description='clear sky',
+                wind_speed=1.5, clouds=0, **fields):
+    """A current weather API payload with the fields the ingest path reads; extra keys go on top"""
+    return {
+        'main': {'temp': temp, 'humidity': humidity, 'pressure': pressure},
+        'weather': [{'main': condition, 'description': description}],
+        'wind': {'speed': wind_speed},
+        'clouds': {'all': clouds},
+        **fields,
+    }
 
 
 class CityModelTest(TestCase):
@@ -147,25 +223,21 @@ class FormsTest(TestCase):
 
     def test_city_form_valid(self):
         """Test that CityForm works with valid data"""
-        from .forms import CityForm
         form = CityForm(data={'name': 'Berlin'})
         self.assertTrue(form.is_valid())
 
     def test_city_form_invalid(self):
         """Test that CityForm fails with invalid data"""
-        from .forms import CityForm
         form = CityForm(data={'name': ''})
         self.assertFalse(form.is_valid())
 
     def test_search_weather_form_valid(self):
         """Test that SearchWeatherForm works with valid data"""
-        from .forms import SearchWeatherForm
         form = SearchWeatherForm(data={'city_name': 'New York'})
         self.assertTrue(form.is_valid())
 
     def test_search_weather_form_invalid(self):
         """Test that SearchWeatherForm fails with invalid data"""
-        from .forms import SearchWeatherForm
         form = SearchWeatherForm(data={'city_name': ''})
         self.assertFalse(form.is_valid())
 
@@ -197,6 +269,1731 @@ class TemplateTest(TestCase):
         self.assertIn('weather_history', response.context)
 
 
+class CityDetailFanOutTest(TestCase):
+    """Test Case for the parallel upstream fetch stage in CityDetailView"""
+
+    def setUp(self):
+        self.client = Client()
+        self.city = City.objects.create(
+            name="Oslo",
+            country="NO",
+            latitude=59.91,
+            longitude=10.75
+        )
+
+    def test_upstream_calls_run_concurrently(self):
+        """Test that page latency tracks the slowest call, not the sum"""
+        def slow(result):
+            def fetch(*args, **kwargs):
+                time.sleep(0.3)
+                return result
+            return fetch
+
+        empty_forecast = {'daily': [], 'hourly': []}
+        with mock.patch('WEATHERAPP.views.get_weather_data', slow(None)), \
+                mock.patch('WEATHERAPP.views.get_forecast', slow(empty_forecast)), \
+                mock.patch('WEATHERAPP.views.get_aqi_data', slow(None)), \
+                mock.patch('WEATHERAPP.views.get_uvi_data', slow(None)):
+            started = time.monotonic()
+            response = self.client.get(
+                reverse('weather_city_detail', args=[self.city.id])
+            )
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, 1.0)
+
+    def test_aqi_uses_stored_coordinates(self):
+        """Test that AQI/UVI start from stored coordinates without current data"""
+        with mock.patch('WEATHERAPP.views.get_weather_data', return_value=None), \
+                mock.patch('WEATHERAPP.views.get_forecast',
+                           return_value={'daily': [], 'hourly': []}), \
+                mock.patch('WEATHERAPP.views.get_aqi_data', return_value={'aqi': 2}) as aqi, \
+                mock.patch('WEATHERAPP.views.get_uvi_data', return_value=None):
+            response = self.client.get(
+                reverse('weather_city_detail', args=[self.city.id])
+            )
+
+        aqi.assert_called_once_with(59.91, 10.75)
+        self.assertEqual(response.context['aqi_data'], {'aqi': 2})
+
+
+class UpstreamCacheTest(TestCase):
+    """Test Case for the OpenWeatherMap response cache"""
+
+    def setUp(self):
+        caches['weather'].clear()
+        cache_stats.reset()
+
+    def test_many_lookup_counts_misses(self):
+        """Test that a batched lookup records a hit or miss per id"""
+        store_json_many('forecast', [({'q': 'Oslo'}, {'list': []})])
+        hits = cached_json_many('forecast', {1: {'q': 'Oslo'}, 2: {'q': 'Bergen'}, 3: {'q': 'Tromso'}})
+        self.assertEqual(list(hits), [1])
+        self.assertEqual(cache_stats.snapshot()['forecast'], {'hits': 1, 'misses': 2, 'coalesced': 0})
+
+    def test_equivalent_params_share_a_key(self):
+        """Test that city name spelling and the API key do not affect the key"""
+        self.assertEqual(
+            make_cache_key('weather', {'q': 'London', 'appid': 'a'}),
+            make_cache_key('weather', {'q': '  london ', 'appid': 'b'}),
+        )
+        self.assertNotEqual(
+            make_cache_key('weather', {'q': 'London'}),
+            make_cache_key('forecast', {'q': 'London'}),
+        )
+
+    def test_second_call_is_served_from_cache(self):
+        """Test that repeated fetches hit the cache and count hits/misses"""
+        payload = {'name': 'London', 'main': {'temp': 10}}
+        with mock.patch('WEATHERAPP.views.fetch_json', return_value=payload) as fetch:
+            self.assertEqual(get_weather_data('London'), payload)
+            self.assertEqual(get_weather_data('london'), payload)
+        fetch.assert_called_once()
+
+        response = self.client.get(reverse('cache_stats'))
+        self.assertEqual(
+            response.json()['upstream_cache']['weather'],
+            {'hits': 1, 'misses': 1, 'coalesced': 0}
+        )
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = LRULocMemCache('lru-test', {'OPTIONS': {'MAX_ENTRIES': 2}})
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+
+class ForecastParsingTest(TestCase):
+    """Test Case for the single-request forecast parsing"""
+
+    def setUp(self):
+        caches['weather'].clear()
+        self.city = City.objects.create(name="Lima", country="PE")
+        start = int(datetime(2026, 3, 1, 0, 0).timestamp())
+        self.payload = {'list': [
+            {
+                'dt': start + i * 3 * 3600,
+                'main': {'temp': 20 + i, 'temp_min': 19, 'temp_max': 25,
+                         'humidity': 60, 'pressure': 1010, 'feels_like': 20},
+                'weather': [{'main': 'Clear', 'description': 'clear sky'}],
+                'wind': {'speed': 2.0},
+                'clouds': {'all': 0},
+                'pop': 0.1,
+            }
+            for i in range(40)
+        ]}
+
+    def test_parse_forecast_views(self):
+        """Test that one parse yields both daily and hourly views"""
+        forecast = parse_forecast(self.payload)
+        self.assertEqual(len(forecast['hourly']), 8)
+        self.assertEqual(len(forecast['daily']), 5)
+        self.assertEqual(forecast['daily'][0]['hour'], 12)
+
+    def test_hourly_endpoint_shares_forecast_request(self):
+        """Test that detail page and hourly endpoint share one forecast fetch"""
+        with mock.patch('WEATHERAPP.views.fetch_json', return_value=self.payload) as fetch:
+            get_forecast(self.city)
+            response = self.client.get(reverse('get_hourly_data', args=[self.city.id]))
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(len(response.json()['hourly_forecast']), 8)
+
+
+class BulkWeatherFetchTest(TestCase):
+    """Test Case for the multi-city current weather fetch"""
+
+    def setUp(self):
+        caches['weather'].clear()
+        self.cities = [
+            City.objects.create(name=name) for name in ("Rome", "Madrid", "Vienna")
+        ]
+
+    def test_duplicates_fetched_once(self):
+        """Test that repeated cities are fetched once and keyed by id"""
+        with mock.patch('WEATHERAPP.views.fetch_json',
+                        side_effect=lambda url, params: {'name': params['q']}) as fetch:
+            results = get_bulk_weather_data(self.cities + self.cities[:2])
+        self.assertEqual(fetch.call_count, 3)
+        self.assertEqual(
+            results,
+            {city.id: {'name': city.name} for city in self.cities}
+        )
+
+    def test_cached_cities_are_not_refetched(self):
+        """Test that only cache misses go upstream"""
+        with mock.patch('WEATHERAPP.views.fetch_json',
+                        side_effect=lambda url, params: {'name': params['q']}) as fetch:
+            get_bulk_weather_data(self.cities[:1])
+            get_bulk_weather_data(self.cities)
+        self.assertEqual(fetch.call_count, 3)
+
+    def test_misses_fetched_concurrently(self):
+        """Test that the cost of a batch tracks the slowest request"""
+
+        def slow_fetch(url, params):
+            time.sleep(0.3)
+            return {'name': params['q']}
+
+        with mock.patch('WEATHERAPP.views.fetch_json', side_effect=slow_fetch):
+            started = time.monotonic()
+            results = get_bulk_weather_data(self.cities)
+            elapsed = time.monotonic() - started
+        self.assertEqual(len(results), 3)
+        self.assertLess(elapsed, 0.8)
+
+
+    def test_failure_stops_remaining_work(self):
+        """Test that an error cancels queued calls and waits for running ones"""
+        finished = []
+
+        def work(item):
+            if item == 0:
+                raise ValueError("boom")
+            time.sleep(0.1)
+            finished.append(item)
+            return item
+
+        with self.assertRaises(ValueError):
+            map_concurrently(work, range(20), max_concurrency=3)
+        settled = list(finished)
+        time.sleep(0.3)
+        # Only the calls already running finished, and all before the raise
+        self.assertEqual(finished, settled)
+        self.assertLessEqual(len(finished), 2)
+
+
+class HttpClientTest(TestCase):
+    """Test Case for the shared OpenWeatherMap HTTP session"""
+
+    def tearDown(self):
+        reset_session()
+
+    def test_session_is_shared(self):
+        """Test that every call reuses the same pooled session"""
+        self.assertIs(get_session(), get_session())
+
+    def test_retry_and_pool_configuration(self):
+        """Test that the background adapter retries 429/5xx and uses the pool size"""
+        with self.settings(OPENWEATHERMAP_HTTP={'POOL_MAXSIZE': 7, 'MAX_RETRIES': 4}):
+            reset_session()
+            adapter = get_session(background=True).get_adapter('https://api.openweathermap.org/')
+        self.assertEqual(adapter._pool_maxsize, 7)
+        self.assertEqual(adapter.max_retries.total, 4)
+        self.assertIn(429, adapter.max_retries.status_forcelist)
+
+    def test_interactive_calls_never_retry(self):
+        """Test that calls outside background_calls() fail on the first error"""
+        adapter = get_session().get_adapter('https://api.openweathermap.org/')
+        self.assertEqual(adapter.max_retries.total, 0)
+        response = mock.Mock()
+        response.json.return_value = {}
+        with mock.patch.object(get_session(background=True), 'get', return_value=response) as background:
+            with background_calls():
+                get_json('https://example.com', {})
+        background.assert_called_once()
+
+    def test_retry_after_is_capped(self):
+        """Test that a long Retry-After is not honoured in full"""
+        response = mock.Mock()
+        response.headers = {'Retry-After': '3600'}
+        with self.settings(OPENWEATHERMAP_HTTP={'RETRY_AFTER_MAX': 5}):
+            self.assertEqual(CappedRetry(total=2).get_retry_after(response), 5)
+
+    def test_get_json_uses_connect_and_read_timeouts(self):
+        """Test that requests carry the configured timeouts"""
+        response = mock.Mock()
+        response.json.return_value = {'ok': True}
+        with mock.patch.object(get_session(), 'get', return_value=response) as get:
+            self.assertEqual(get_json('https://example.com', {'q': 'x'}), {'ok': True})
+        self.assertEqual(get.call_args.kwargs['timeout'], (3.05, 5))
+
+
+class UpdateWeatherCommandTest(TestCase):
+    """Test Case for the update_weather management command"""
+
+    def setUp(self):
+        self.cities = [City.objects.create(name=f"City {i}") for i in range(5)]
+        self.payload = owm_payload(temp=12.0, pressure=1012)
+
+    def test_concurrent_update_writes_in_batches(self):
+        """Test that every city gets a record and the summary is printed"""
+
+        def fetch(city, fresh=False):
+            return None if city.name == "City 0" else self.payload
+
+        out = StringIO()
+        with mock.patch('WEATHERAPP.views.get_weather_data',
+                        side_effect=fetch), \
+                mock.patch.object(WeatherData.objects, 'bulk_create',
+                                  wraps=WeatherData.objects.bulk_create) as bulk_create:
+            call_command('update_weather', workers=3, batch_size=2, stdout=out)
+
+        self.assertEqual(WeatherData.objects.count(), 4)
+        self.assertEqual(bulk_create.call_count, 2)
+        self.assertIn('Updated 4 cities', out.getvalue())
+        self.assertIn('1 failed', out.getvalue())
+
+    def test_invalid_rate(self):
+        """Test that a malformed --rate is rejected"""
+        with self.assertRaises(CommandError):
+            call_command('update_weather', rate='sixty')
+
+
+class TokenBucketTest(TestCase):
+    """Test Case for the upstream rate limiter"""
+
+    def test_parse_rate(self):
+        """Test that rates are parsed into calls and seconds"""
+        self.assertEqual(parse_rate('60/min'), (60, 60))
+        self.assertEqual(parse_rate('5/s'), (5, 1))
+        with self.assertRaises(ValueError):
+            parse_rate('0/min')
+
+    def test_acquire_blocks_when_empty(self):
+        """Test that calls beyond the burst capacity wait for a refill"""
+        bucket = TokenBucket(20, 1, capacity=1)
+        started = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def test_default_rate_is_evenly_spaced(self):
+        """Test that a new bucket does not allow a full period's burst up front"""
+        bucket = TokenBucket.from_string('20/s')
+        started = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def test_retries_take_tokens(self):
+        """Test that every attempt of a retried call consumes a token"""
+        limiter = mock.Mock()
+        self.addCleanup(reset_session)
+        with self.settings(OPENWEATHERMAP_HTTP={'MAX_RETRIES': 2, 'BACKOFF_FACTOR': 0, 'RETRY_AFTER_MAX': 0}), \
+                FakeOWMServer(throttle_rate=1.0) as server:
+            reset_session()
+            with background_calls(limiter):
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    get_json(f'{server.api_root}/weather', {'q': 'Oslo'})
+        self.assertEqual(limiter.acquire.call_count, 3)
+        self.assertEqual(server.counts[('weather', 429)], 3)
+
+
+class WeatherIngestTest(TestCase):
+    """Test Case for the WeatherData write path"""
+
+    def setUp(self):
+        self.city = City.objects.create(name="Cairo", country="EG")
+        self.payload = owm_payload(
+            temp=30.0, humidity=20, pressure=1008, wind_speed=4.1,
+            visibility=10000, sys={'sunrise': 1700000000, 'sunset': 1700040000},
+        )
+        self.payload['main'].update(feels_like=31.0, temp_min=29.0, temp_max=32.0)
+        self.payload['wind']['deg'] = 300
+
+    def test_payload_mapping(self):
+        """Test that every stored field is mapped from the payload"""
+        record = weather_record_from_payload(self.city, self.payload)
+        self.assertEqual(record.temperature, 30.0)
+        self.assertEqual(record.temp_max, 32.0)
+        self.assertEqual(record.wind_deg, 300)
+        self.assertEqual(record.visibility, 10000)
+        self.assertEqual(record.sunset, 1700040000)
+
+    def test_writer_flushes_in_batches(self):
+        """Test that the writer uses one INSERT per batch"""
+        with CaptureQueriesContext(connection) as queries:
+            with WeatherDataWriter(batch_size=3) as writer:
+                for _ in range(5):
+                    writer.add(weather_record_from_payload(self.city, self.payload))
+        inserts = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('INSERT INTO "WEATHERAPP_weatherdata"')
+        ]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(writer.written, 5)
+        self.assertEqual(self.city.weather_records.count(), 5)
+
+    def test_writer_discards_buffer_on_error(self):
+        """Test that records still buffered when the block raises are not written"""
+        with self.assertRaises(RuntimeError):
+            with WeatherDataWriter(batch_size=2) as writer:
+                writer.add(weather_record_from_payload(self.city, self.payload))
+                raise RuntimeError
+        self.assertEqual(self.city.weather_records.count(), 0)
+
+    def test_failed_flush_rolls_back_batch(self):
+        """Test that a flush failing halfway leaves no partial batch"""
+        with mock.patch('WEATHERAPP.ingest.apply_rollups', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                with WeatherDataWriter(batch_size=1) as writer:
+                    writer.add(weather_record_from_payload(self.city, self.payload))
+        self.assertEqual(self.city.weather_records.count(), 0)
+        self.assertFalse(LatestWeather.objects.filter(city=self.city).exists())
+
+
+class WriterLockingTest(TransactionTestCase):
+    """Test Case checking the write path does not hold the database lock"""
+
+    def setUp(self):
+        self.city = City.objects.create(name="Lagos", country="NG")
+        self.payload = owm_payload(temp=30.0, humidity=70, wind_speed=2.0, clouds=10)
+
+    def write_from_other_connection(self):
+        """Create a Favorite from another thread (and so another connection)"""
+        errors = []
+
+        def write():
+            try:
+                Favorite.objects.create(city=self.city)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join()
+        return errors
+
+    def test_other_connection_can_write_between_flushes(self):
+        """Test that a flushed batch does not keep a transaction open"""
+        with WeatherDataWriter(batch_size=1) as writer:
+            writer.add(weather_record_from_payload(self.city, self.payload))
+            self.assertEqual(self.write_from_other_connection(), [])
+            writer.add(weather_record_from_payload(self.city, self.payload))
+        self.assertEqual(WeatherData.objects.count(), 2)
+        self.assertTrue(Favorite.objects.exists())
+
+    def test_other_connection_can_write_during_update_run(self):
+        """Test that update_weather holds no lock while fetching"""
+        other = City.objects.create(name="Accra", country="GH")
+        errors = []
+
+        def fetch(city, fresh=False):
+            if city == other:
+                errors.extend(self.write_from_other_connection())
+            return self.payload
+
+        with mock.patch('WEATHERAPP.views.get_weather_data', side_effect=fetch):
+            call_command('update_weather', batch_size=1, stdout=StringIO())
+        self.assertEqual(errors, [])
+        self.assertEqual(WeatherData.objects.count(), 2)
+
+
+class QueryPlanTest(TestCase):
+    """Test Case checking hot queries are served by an index"""
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plan assertions are written for SQLite')
+        self.city = City.objects.create(name="Delhi", country="IN")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_detail_page_weather_queries(self):
+        """Test that latest-N weather rows per city come from the index"""
+        self.assertUsesIndex(
+            self.city.weather_records.all()[:1], 'weather_city_timestamp_idx'
+        )
+        self.assertUsesIndex(
+            self.city.weather_records.all()[:30], 'weather_city_timestamp_idx'
+        )
+
+    def test_recent_searches_query(self):
+        """Test that recent searches are read in index order"""
+        self.assertUsesIndex(SearchHistory.objects.all()[:10], 'search_searched_at_id_idx')
+        self.assertUsesIndex(
+            SearchHistory.objects.order_by('-searched_at', '-id')[:20], 'search_searched_at_id_idx'
+        )
+        self.assertUsesIndex(
+            City.objects.filter(last_searched_at__isnull=False).order_by('-last_searched_at', '-id')[:10],
+            'city_last_searched_idx'
+        )
+
+    def test_favorites_query(self):
+        """Test that favorites are read in index order"""
+        self.assertUsesIndex(Favorite.objects.all(), 'favorite_added_at_idx')
+
+
+class LatestWeatherTest(TestCase):
+    """Test Case for the LatestWeather projection"""
+
+    def setUp(self):
+        self.city = City.objects.create(name="Lagos", country="NG")
+        self.payload = owm_payload(
+            temp=28.0, humidity=80, condition='Rain', description='light rain', wind_speed=3.0, clouds=75
+        )
+
+    def test_ingestion_updates_projection(self):
+        """Test that the newest ingested record becomes the latest weather"""
+        record_weather(self.city, self.payload)
+        record_weather(self.city, dict(self.payload, main={'temp': 29.5, 'humidity': 70, 'pressure': 1011}))
+        latest = LatestWeather.objects.get(city=self.city)
+        self.assertEqual(latest.temperature, 29.5)
+        self.assertEqual(LatestWeather.objects.count(), 1)
+
+    def test_favorites_render_from_database(self):
+        """Test that stored conditions are shown without calling the API"""
+        record_weather(self.city, self.payload)
+        Favorite.objects.create(city=self.city)
+        with mock.patch('WEATHERAPP.views.fetch_json') as fetch:
+            response = self.client.get(reverse('favorites'))
+        fetch.assert_not_called()
+        self.assertEqual(response.context['weather_data'][self.city.id]['temperature'], 28.0)
+
+    def test_unobserved_city_is_fetched_and_stored(self):
+        """Test that a city without observations is fetched once and stored"""
+        caches['weather'].clear()
+        record_search(self.city)
+        with mock.patch('WEATHERAPP.views.fetch_json', return_value=self.payload):
+            response = self.client.get(reverse('weather_index'))
+        self.assertEqual(response.context['weather_data'][self.city.id]['description'], 'Light Rain')
+        self.assertTrue(LatestWeather.objects.filter(city=self.city).exists())
+
+
+class WeatherRollupTest(TestCase):
+    """Test Case for hourly and daily rollups"""
+
+    def setUp(self):
+        self.city = City.objects.create(name="Nairobi", country="KE")
+
+    def ingest(self, temperature, weather_main='Clouds'):
+        return record_weather(self.city, owm_payload(
+            temp=temperature, humidity=60, pressure=1015, condition=weather_main,
+            description=weather_main.lower(), wind_speed=2.0, clouds=40,
+        ))
+
+    def test_rollups_maintained_at_ingestion(self):
+        """Test that each observation is folded into hourly and daily buckets"""
+        for temperature, condition in ((18.0, 'Clouds'), (22.0, 'Rain'), (20.0, 'Clouds')):
+            self.ingest(temperature, condition)
+
+        daily = DailyWeatherRollup.objects.get(city=self.city)
+        self.assertEqual(daily.count, 3)
+        self.assertEqual(daily.temp_mean, 20.0)
+        self.assertEqual((daily.temp_min, daily.temp_max), (18.0, 22.0))
+        self.assertEqual(daily.weather_main, 'Clouds')
+        self.assertEqual(daily.humidity_mean, 60)
+        self.assertEqual(
+            sum(HourlyWeatherRollup.objects.filter(city=self.city).values_list('count', flat=True)),
+            3
+        )
+
+    def test_backfill_rebuilds_rollups(self):
+        """Test that the backfill command reproduces the incremental rollups"""
+        self.ingest(10.0)
+        self.ingest(14.0)
+        DailyWeatherRollup.objects.all().delete()
+
+        call_command('backfill_rollups', chunk_size=1, stdout=StringIO())
+
+        daily = DailyWeatherRollup.objects.get(city=self.city)
+        self.assertEqual(daily.count, 2)
+        self.assertEqual(daily.temp_mean, 12.0)
+
+    def test_backfill_keeps_rollups_of_pruned_rows(self):
+        """Test that buckets older than the raw history survive a rebuild"""
+        self.ingest(10.0)
+        old = day_bucket(timezone.now() - timedelta(days=40))
+        for days in range(3):
+            DailyWeatherRollup.objects.create(city=self.city, bucket=old - timedelta(days=days), count=4, temp_sum=40.0)
+
+        call_command('backfill_rollups', stdout=StringIO())
+
+        self.assertEqual(DailyWeatherRollup.objects.filter(city=self.city, bucket__lte=old).count(), 3)
+        self.assertEqual(DailyWeatherRollup.objects.filter(city=self.city, bucket__gt=old).get().count, 1)
+
+    def test_backfill_keeps_partly_pruned_bucket(self):
+        """Test that a bucket which lost some raw rows is not rebuilt from the rest"""
+        start = hour_bucket(timezone.now() - timedelta(days=3))
+        records = [self.ingest(10.0), self.ingest(14.0)]
+        for minutes, record in zip((10, 20), records):
+            WeatherData.objects.filter(pk=record.pk).update(timestamp=start + timedelta(minutes=minutes))
+        call_command('backfill_rollups', stdout=StringIO())
+        WeatherData.objects.filter(pk=records[0].pk).delete()  # pruned
+
+        call_command('backfill_rollups', stdout=StringIO())
+
+        rollup = HourlyWeatherRollup.objects.get(city=self.city, bucket=start)
+        self.assertEqual((rollup.count, rollup.temp_mean), (2, 12.0))
+
+    def test_migration_backfills_existing_history(self):
+        """Test that migration 0006 rolls up observations stored before it"""
+        self.ingest(10.0)
+        self.ingest(14.0)
+        HourlyWeatherRollup.objects.all().delete()
+        DailyWeatherRollup.objects.all().delete()
+
+        apps = MigrationLoader(connection).project_state(('WEATHERAPP', '0006_weather_rollups')).apps
+        importlib.import_module('WEATHERAPP.migrations.0006_weather_rollups').backfill_rollups(apps, None)
+
+        self.assertEqual(DailyWeatherRollup.objects.get(city=self.city).temp_mean, 12.0)
+        self.assertTrue(HourlyWeatherRollup.objects.filter(city=self.city).exists())
+
+    def test_trend_reads_rollups(self):
+        """Test that the detail page trend comes from hourly rollups"""
+        self.ingest(10.0)
+        self.ingest(14.0)
+        WeatherData.objects.all().delete()
+        with mock.patch('WEATHERAPP.views.get_weather_data', return_value=None), \
+                mock.patch('WEATHERAPP.views.get_forecast',
+                           return_value={'daily': [], 'hourly': []}), \
+                mock.patch('WEATHERAPP.views.get_aqi_data', return_value=None), \
+                mock.patch('WEATHERAPP.views.get_uvi_data', return_value=None):
+            response = self.client.get(reverse('weather_city_detail', args=[self.city.id]))
+        self.assertEqual(response.context['temp_trend']['avg'], 12.0)
+
+
+class RetentionTest(TestCase):
+    """Test Case for the retention policy and prune_weather command"""
+
+    def setUp(self):
+        self.city = City.objects.create(name="Quito", country="EC")
+        payload = owm_payload(
+            temp=14.0, humidity=70, pressure=1020, condition='Clouds', description='few clouds',
+            wind_speed=1.0, clouds=20,
+        )
+        for _ in range(5):
+            record_weather(self.city, payload)
+        old = timezone.now() - timedelta(days=30)
+        old_ids = list(WeatherData.objects.values_list('id', flat=True)[:3])
+        WeatherData.objects.filter(id__in=old_ids).update(timestamp=old)
+        self.city.hourly_rollups.update(bucket=old)
+
+    def test_prune_deletes_expired_rows_in_chunks(self):
+        """Test that only rows outside the window are deleted"""
+        out = StringIO()
+        call_command('prune_weather', chunk_size=2, stdout=out)
+        self.assertEqual(WeatherData.objects.count(), 2)
+        # Hourly rollups are 30 days old, within the 90 day window
+        self.assertTrue(self.city.hourly_rollups.exists())
+        self.assertIn('raw: pruned 3 rows', out.getvalue())
+        self.assertIn('daily: kept forever', out.getvalue())
+
+    def test_dry_run_deletes_nothing(self):
+        """Test that --dry-run only reports"""
+        out = StringIO()
+        call_command('prune_weather', dry_run=True, stdout=out)
+        self.assertEqual(WeatherData.objects.count(), 5)
+        self.assertIn('raw: would prune 3 rows', out.getvalue())
+
+    def test_unrolled_rows_survive_prune_until_backfilled(self):
+        """Test that prune then backfill loses no history"""
+        # History stored before rollups existed
+        HourlyWeatherRollup.objects.all().delete()
+        DailyWeatherRollup.objects.all().delete()
+
+        out = StringIO()
+        call_command('prune_weather', stdout=out)
+        self.assertEqual(WeatherData.objects.count(), 5)
+        self.assertIn('Kept 5 raw rows that are not rolled up yet', out.getvalue())
+
+        call_command('backfill_rollups', stdout=StringIO())
+        call_command('prune_weather', stdout=StringIO())
+        self.assertEqual(WeatherData.objects.count(), 2)
+        self.assertEqual(sum(HourlyWeatherRollup.objects.values_list('count', flat=True)), 5)
+        self.assertEqual(sum(DailyWeatherRollup.objects.values_list('count', flat=True)), 5)
+
+    def test_rollup_coverage_read_once(self):
+        """Test that raw pruning reads rollup coverage once, not per chunk"""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(prune_tier('raw', 7, chunk_size=1), 3)
+        rollup_reads = [query for query in queries.captured_queries if 'hourlyweatherrollup' in query['sql']]
+        self.assertEqual(len(rollup_reads), 1)
+
+    def test_invalid_policy(self):
+        """Test that aggregates may not expire before raw rows"""
+        with self.settings(WEATHER_RETENTION_DAYS={'raw': 30, 'hourly': 7}):
+            with self.assertRaises(ValueError):
+                get_retention_days()
+
+
+class StaleWhileRevalidateTest(TestCase):
+    """Test Case for freshness-based rendering of the city detail page"""
+
+    def setUp(self):
+        self.city = City.objects.create(name="Seoul", country="KR")
+        record_weather(self.city, owm_payload(temp=5.0, humidity=40, pressure=1025, wind_speed=2.5))
+
+    def age_observation(self, minutes):
+        LatestWeather.objects.filter(city=self.city).update(
+            observed_at=timezone.now() - timedelta(minutes=minutes)
+        )
+
+    def get_detail(self):
+        with mock.patch('WEATHERAPP.views.get_weather_data', return_value=None) as current, \
+                mock.patch('WEATHERAPP.views.get_forecast',
+                           return_value={'daily': [], 'hourly': []}), \
+                mock.patch('WEATHERAPP.views.get_aqi_data', return_value=None), \
+                mock.patch('WEATHERAPP.views.get_uvi_data', return_value=None), \
+                mock.patch('WEATHERAPP.views.background_refresher') as refresher:
+            response = self.client.get(reverse('weather_city_detail', args=[self.city.id]))
+        return response, current, refresher
+
+    def test_fresh_observation_served_without_fetch(self):
+        """Test that a fresh observation is rendered as-is"""
+        response, current, refresher = self.get_detail()
+        self.assertEqual(response.context['freshness'], 'fresh')
+        self.assertEqual(response.context['current_api_data']['temperature'], 5.0)
+        current.assert_not_called()
+        refresher.schedule.assert_not_called()
+
+    def test_stale_observation_served_and_refreshed(self):
+        """Test that a stale observation is rendered and refreshed in the background"""
+        self.age_observation(30)
+        response, current, refresher = self.get_detail()
+        self.assertEqual(response.context['freshness'], 'stale')
+        self.assertEqual(response.context['current_api_data']['temperature'], 5.0)
+        current.assert_not_called()
+        refresher.schedule.assert_called_once()
+
+    def test_expired_observation_fetched_synchronously(self):
+        """Test that an expired observation is fetched before rendering"""
+        self.age_observation(120)
+        response, current, refresher = self.get_detail()
+        self.assertEqual(response.context['freshness'], 'expired')
+        current.assert_called_once_with(self.city, fresh=True)
+
+    def test_concurrent_refreshes_are_coalesced(self):
+        """Test that only one refresh per key runs at a time"""
+        release = threading.Event()
+        calls = []
+
+        def refresh():
+            calls.append(1)
+            release.wait(1)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            refresher = BackgroundRefresher(executor)
+            results = [refresher.schedule(self.city.id, refresh) for _ in range(5)]
+            release.set()
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(len(calls), 1)
+        self.assertFalse(refresher.is_refreshing(self.city.id))
+
+
+    def test_cards_flag_stale_observations(self):
+        """Test that favorites and recent searches mark cards that are not fresh"""
+        Favorite.objects.create(city=self.city)
+        City.objects.filter(pk=self.city.pk).update(last_searched_at=timezone.now())
+        for url in (reverse('favorites'), reverse('weather_index')):
+            with self.subTest(url=url):
+                self.age_observation(0)
+                response = self.client.get(url)
+                self.assertEqual(response.context['weather_data'][self.city.id]['freshness'], FRESH)
+                # The badge markup, not the live update script that removes it
+                self.assertNotContains(response, 'data-stale-badge title=')
+
+                self.age_observation(30)
+                response = self.client.get(url)
+                self.assertEqual(response.context['weather_data'][self.city.id]['freshness'], STALE)
+                self.assertContains(response, 'data-stale-badge title=')
+
+    def test_favorites_etag_changes_when_card_turns_stale(self):
+        """Test that a cached favorites page revalidates once a card ages"""
+        Favorite.objects.create(city=self.city)
+        etag = self.client.get(reverse('favorites'))['ETag']
+        self.age_observation(30)
+        self.assertEqual(self.client.get(reverse('favorites'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+class SingleFlightTest(TestCase):
+    """Test Case for coalescing identical in-flight upstream requests"""
+
+    def setUp(self):
+        caches['weather'].clear()
+        cache_stats.reset()
+
+    def test_concurrent_callers_share_one_fetch(self):
+        """Test that simultaneous misses for one key trigger a single fetch"""
+
+        def slow_fetch(url, params):
+            time.sleep(0.2)
+            return {'name': params['q']}
+
+        with mock.patch('WEATHERAPP.views.fetch_json', side_effect=slow_fetch) as fetch:
+            with ThreadPoolExecutor(max_workers=10) as executor:
+                results = list(executor.map(get_weather_data, ['Berlin'] * 10))
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(results, [{'name': 'Berlin'}] * 10)
+        self.assertEqual(cache_stats.snapshot()['weather']['coalesced'], 9)
+
+    def test_errors_are_shared(self):
+        """Test that followers receive the leader's exception"""
+        flight = SingleFlight()
+        started = threading.Event()
+        errors = []
+
+        def failing():
+            started.set()
+            time.sleep(0.1)
+            raise ValueError('upstream down')
+
+        def follower():
+            started.wait()
+            try:
+                flight.do('key', lambda: 'unused')
+            except ValueError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=follower)
+        thread.start()
+        with self.assertRaises(ValueError):
+            flight.do('key', failing)
+        thread.join()
+        self.assertEqual(len(errors), 1)
+
+    def test_shared_lock_waits_for_other_worker(self):
+        """Test that a worker not holding the cache lock reuses the other's result"""
+        params = {'q': 'Paris'}
+        key = make_cache_key('weather', params)
+        cache = caches['weather']
+        cache.add(f'{key}:lock', 1, 10)  # Another worker is fetching
+        fetch = mock.Mock(return_value={'name': 'fetched'})
+
+        with self.settings(WEATHER_SINGLE_FLIGHT={'SHARED_LOCKS': True, 'WAIT_TIMEOUT': 1}):
+            threading.Timer(0.1, cache.set, args=(key, {'name': 'other worker'})).start()
+            data = cached_json('weather', params, fetch)
+
+        fetch.assert_not_called()
+        self.assertEqual(data, {'name': 'other worker'})
+
+
+class RefreshSchedulerTest(TestCase):
+    """Test Case for the background refresh scheduler"""
+
+    def setUp(self):
+        self.cities = [City.objects.create(name=f"Town {i}") for i in range(4)]
+        Favorite.objects.create(city=self.cities[0])
+        record_search(self.cities[1])
+        self.options = {
+            'FAVORITE_INTERVAL': 10, 'RECENT_INTERVAL': 20, 'DEFAULT_INTERVAL': 40,
+            'RECENT_WINDOW': 3600, 'SYNC_INTERVAL': 100,
+        }
+
+    def test_cadence_by_priority(self):
+        """Test that favorites and recent searches get shorter intervals"""
+        scheduler = RefreshScheduler(self.options)
+        scheduler.sync(now=0)
+        for city_id in scheduler.pop_due(now=100):
+            scheduler.reschedule(city_id, now=100)
+        due = dict((city_id, when) for when, city_id in scheduler._heap
+                   if scheduler._due.get(city_id) == when)
+        self.assertEqual(due[self.cities[0].id], 110)
+        self.assertEqual(due[self.cities[1].id], 120)
+        self.assertEqual(due[self.cities[2].id], 140)
+
+    def test_new_cities_spread_over_interval(self):
+        """Test that cities added together do not all refresh at once"""
+        scheduler = RefreshScheduler(self.options)
+        scheduler.sync(now=0)
+        # Two default-cadence cities share the 40s interval: due at 0 and 20
+        self.assertEqual(
+            sorted(scheduler.pop_due(now=0)),
+            sorted([self.cities[0].id, self.cities[1].id, self.cities[2].id])
+        )
+        self.assertEqual(scheduler.pop_due(now=19), [])
+        self.assertEqual(scheduler.pop_due(now=20), [self.cities[3].id])
+
+    def test_deleted_city_is_dropped(self):
+        """Test that a deleted city leaves the schedule on the next sync"""
+        scheduler = RefreshScheduler(self.options)
+        scheduler.sync(now=0)
+        self.cities[3].delete()
+        scheduler.sync(now=1)
+        self.assertEqual(len(scheduler), 3)
+        self.assertNotIn(self.cities[3].id, scheduler.pop_due(now=1000))
+
+    def test_run_stops_gracefully(self):
+        """Test that the loop submits due refreshes and exits on stop"""
+        stop = threading.Event()
+        refreshed = []
+        executor = mock.Mock()
+        executor.submit.side_effect = lambda fn, refresh, city_id: refreshed.append(city_id) or mock.Mock()
+        scheduler = RefreshScheduler(self.options)
+        threading.Timer(0.2, stop.set).start()
+        scheduler.run(mock.Mock(), executor, stop, max_sleep=0.05)
+        self.assertEqual(len(refreshed), 3)
+
+    def test_run_bounds_outstanding_refreshes(self):
+        """Test that due cities wait in the schedule while workers are busy"""
+        stop = threading.Event()
+        release = threading.Event()
+        started = []
+
+        def refresh(city_id):
+            started.append(city_id)
+            release.wait(5)
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        submit = mock.Mock(side_effect=executor.submit)
+        scheduler = RefreshScheduler(self.options)
+        threading.Timer(0.3, stop.set).start()
+        scheduler.run(refresh, mock.Mock(submit=submit), stop, max_sleep=0.05,
+                      max_in_flight=1, poll_interval=0.05)
+        release.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        # Three cities were due, but only one refresh was ever outstanding
+        self.assertEqual(submit.call_count, 1)
+        self.assertEqual(len(started), 1)
+        self.assertEqual(len(scheduler.pop_due(now=scheduler.clock())), 2)
+
+
+class LiveUpdatesTest(TestCase):
+    """Test Case for the live update poll endpoint"""
+
+    def setUp(self):
+        self.city = City.objects.create(name="Perth", country="AU")
+        self.other = City.objects.create(name="Hobart", country="AU")
+        payload = owm_payload(temp=24.0, humidity=30, pressure=1012, wind_speed=5.0)
+        self.record = record_weather(self.city, payload)
+        record_weather(self.other, payload)
+
+    def test_only_newer_observations_returned(self):
+        """Test that pollers receive only changed observations for their cities"""
+        url = reverse('weather_updates')
+        observed = self.record.timestamp.timestamp()
+
+        response = self.client.get(url, {'ids': str(self.city.id), 'since': observed - 60})
+        updates = response.json()['updates']
+        self.assertEqual(list(updates), [str(self.city.id)])
+        self.assertEqual(updates[str(self.city.id)]['temperature'], 24.0)
+
+        response = self.client.get(url, {'ids': str(self.city.id), 'since': observed})
+        self.assertEqual(response.json()['updates'], {})
+
+    def test_invalid_parameters(self):
+        """Test that malformed ids are rejected"""
+        response = self.client.get(reverse('weather_updates'), {'ids': 'a,b'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_pages_poll_instead_of_reloading(self):
+        """Test that cards are tagged for live updates and no page reloads itself"""
+        Favorite.objects.create(city=self.city)
+        response = self.client.get(reverse('favorites'))
+        self.assertContains(response, f'data-live-city="{self.city.id}"')
+        self.assertNotContains(response, 'location.reload()')
+
+
+class ConditionalGetTest(TestCase):
+    """Test Case for ETag/Last-Modified handling"""
+
+    def setUp(self):
+        caches['weather'].clear()
+        self.city = City.objects.create(name="Reykjavik", country="IS")
+        self.payload = owm_payload(
+            temp=3.0, humidity=85, pressure=990, condition='Snow', description='light snow',
+            wind_speed=9.0, clouds=90,
+        )
+        record_weather(self.city, self.payload)
+        self.forecast = {'list': []}
+
+    def test_city_detail_not_modified(self):
+        """Test that a matching ETag returns 304 without upstream calls"""
+        url = reverse('weather_city_detail', args=[self.city.id])
+        with mock.patch('WEATHERAPP.views.fetch_json', return_value=self.forecast):
+            # Validators are computed before the view, so the first
+            # request only populates the forecast cache
+            self.assertFalse(self.client.get(url).has_header('ETag'))
+            first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.has_header('Last-Modified'))
+
+        with mock.patch('WEATHERAPP.views.fetch_json') as fetch, self.assertNumQueries(1):
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        fetch.assert_not_called()
+
+    def test_city_detail_etag_tracks_aqi_and_uvi(self):
+        """Test that a new AQI or UVI reading changes the detail page ETag"""
+        City.objects.filter(pk=self.city.pk).update(latitude=64.15, longitude=-21.94)
+        url = reverse('weather_city_detail', args=[self.city.id])
+        pollution = {'list': [{'main': {'aqi': 1}, 'components': {}}]}
+
+        def upstream(url, params):
+            return pollution if 'air_pollution' in url else {'value': 1.0} if 'uvi' in url else self.forecast
+        with mock.patch('WEATHERAPP.views.fetch_json', side_effect=upstream):
+            self.client.get(url)
+            etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        params = point_params(64.15, -21.94)
+        refresh_json('uvi', params, lambda: {'value': 6.0})
+        with mock.patch('WEATHERAPP.views.fetch_json', side_effect=upstream):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+            etag = self.client.get(url)['ETag']
+        refresh_json('air_pollution', params, lambda: pollution)
+        with mock.patch('WEATHERAPP.views.fetch_json', side_effect=upstream):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_pending_messages_skip_validators(self):
+        """Test that a redirect's flash message is rendered, not answered with 304"""
+        request = mock.Mock()
+        with mock.patch('WEATHERAPP.views.messages.get_messages', return_value=['Saved']):
+            self.assertIsNone(city_detail_validators(request, self.city.id))
+
+    def test_city_list_etag_tracks_edits(self):
+        """Test that renaming or moving a city changes the city list ETag"""
+        url = reverse('weather_city_list')
+        etag = self.client.get(url)['ETag']
+        self.city.country = "Iceland"
+        self.city.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_new_observation_changes_etag(self):
+        """Test that favorites revalidate after new weather is stored"""
+        Favorite.objects.create(city=self.city)
+        url = reverse('favorites')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        record_weather(self.city, self.payload)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_city_list_etag_depends_on_page(self):
+        """Test that each page of the city list has its own validator"""
+        for index in range(15):
+            City.objects.create(name=f"City {index}")
+        url = reverse('weather_city_list')
+        second_page = self.client.get(url).context['page_obj'].next_cursor
+        self.assertNotEqual(self.client.get(url)['ETag'], self.client.get(url, {'cursor': second_page})['ETag'])
+
+    def test_hourly_endpoint_not_modified(self):
+        """Test that pollers of the hourly endpoint get 304 from the cache version"""
+        url = reverse('get_hourly_data', args=[self.city.id])
+        with mock.patch('WEATHERAPP.views.fetch_json', return_value=self.forecast):
+            self.client.get(url)
+            first = self.client.get(url)
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+
+class WeatherApiTest(TestCase):
+    """Test Case for the read-only JSON API"""
+
+    def setUp(self):
+        caches['weather'].clear()
+        self.observed = City.objects.create(name="Nairobi", country="KE", latitude=-1.29, longitude=36.82)
+        self.unobserved = City.objects.create(name="Quito", country="EC")
+        for temperature in (18.0, 19.0, 21.0):
+            record_weather(self.observed, owm_payload(
+                temp=temperature, humidity=60, pressure=1015, condition='Clouds', description='few clouds',
+                wind_speed=3.0, clouds=20,
+            ))
+        self.forecast = {'list': [{
+            'dt': 1700000000,
+            'main': {'temp': 20.0, 'feels_like': 19.5, 'temp_min': 18.0, 'temp_max': 22.0, 'humidity': 55, 'pressure': 1012},
+            'weather': [{'main': 'Rain', 'description': 'light rain'}],
+            'wind': {'speed': 4.0},
+            'clouds': {'all': 75},
+            'pop': 0.4,
+        }]}
+
+    def test_current(self):
+        """Test current conditions come from the LatestWeather projection"""
+        with mock.patch('WEATHERAPP.views.fetch_json') as fetch:
+            response = self.client.get(reverse('api_current', args=[self.observed.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['temperature'], 21.0)
+        self.assertEqual(response.json()['name'], "Nairobi")
+        fetch.assert_not_called()
+        self.assertEqual(self.client.get(reverse('api_current', args=[self.unobserved.id])).status_code, 404)
+
+    def test_bulk_current(self):
+        """Test the bulk endpoint answers many cities with one query"""
+        ids = f'{self.observed.id},{self.unobserved.id},999'
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api_bulk_current'), {'ids': ids})
+        body = response.json()
+        self.assertEqual(list(body['results']), [str(self.observed.id)])
+        self.assertEqual(body['missing'], [self.unobserved.id, 999])
+
+    def test_bulk_rejects_bad_ids(self):
+        """Test invalid or oversized id lists are a 400"""
+        url = reverse('api_bulk_current')
+        self.assertEqual(self.client.get(url, {'ids': 'a,b'}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        too_many = ','.join(str(i) for i in range(1, 202))
+        self.assertEqual(self.client.get(url, {'ids': too_many}).status_code, 400)
+
+    def test_forecast_is_cache_only(self):
+        """Test a forecast miss returns empty data without calling upstream"""
+        url = reverse('api_forecast', args=[self.observed.id])
+        with mock.patch('WEATHERAPP.views.fetch_json') as fetch, \
+                mock.patch('WEATHERAPP.views.background_refresher') as refresher:
+            body = self.client.get(url).json()
+        fetch.assert_not_called()
+        refresher.schedule.assert_not_called()
+        self.assertFalse(body['cached'])
+        self.assertEqual(body['daily'], [])
+
+        with mock.patch('WEATHERAPP.views.fetch_json', return_value=self.forecast):
+            get_forecast(self.observed)
+        with mock.patch('WEATHERAPP.views.fetch_json') as fetch:
+            body = self.client.get(url).json()
+        fetch.assert_not_called()
+        self.assertTrue(body['cached'])
+        self.assertEqual(body['hourly'][0]['rain_prob'], 40.0)
+        self.assertEqual(body['daily'][0]['main'], 'Rain')
+
+    def test_bulk_forecast(self):
+        """Test the bulk forecast endpoint reports cached and uncached cities"""
+        with mock.patch('WEATHERAPP.views.fetch_json', return_value=self.forecast):
+            get_forecast(self.observed)
+        body = self.client.get(
+            reverse('api_bulk_forecast'), {'ids': f'{self.observed.id},{self.unobserved.id}'}
+        ).json()
+        self.assertTrue(body['results'][str(self.observed.id)]['cached'])
+        self.assertFalse(body['results'][str(self.unobserved.id)]['cached'])
+
+    def test_history_is_paginated(self):
+        """Test history is returned newest first, page by page"""
+        url = reverse('api_history', args=[self.observed.id])
+        body = self.client.get(url, {'page_size': 2}).json()
+        self.assertEqual([row['temperature'] for row in body['results']], [21.0, 19.0])
+        body = self.client.get(body['next']).json()
+        self.assertEqual([row['temperature'] for row in body['results']], [18.0])
+        self.assertIsNone(body['next'])
+        self.assertEqual(self.client.get(reverse('api_history', args=[999])).status_code, 404)
+
+
+class KeysetPaginationTest(TestCase):
+    """Test Case for cursor pagination of the list views"""
+
+    def setUp(self):
+        cities = [City.objects.create(name=f"City {index:02d}") for index in range(25)]
+        for city in cities:
+            record_search(city)
+        # Identical timestamps must still page deterministically (by id)
+        City.objects.filter(id__in=[city.id for city in cities[5:15]]).update(last_searched_at=timezone.now())
+
+    def walk(self, url, cursor_key='next_cursor'):
+        """Follow cursors from the first page, returning the pages' object lists"""
+        pages = []
+        response = self.client.get(url)
+        while True:
+            pages.append(list(response.context['object_list']))
+            cursor = getattr(response.context['page_obj'], cursor_key)
+            if cursor is None:
+                return pages
+            response = self.client.get(url, {'cursor': cursor})
+
+    def test_search_history_pages_cover_every_row_once(self):
+        """Test that following next cursors visits every searched city exactly once, in order"""
+        pages = self.walk(reverse('search_history'))
+        self.assertEqual([len(page) for page in pages], [20, 5])
+        visited = [city.id for page in pages for city in page]
+        expected = list(City.objects.order_by('-last_searched_at', '-id').values_list('id', flat=True))
+        self.assertEqual(visited, expected)
+
+    def test_city_list_backwards(self):
+        """Test that Last and Previous cursors walk the city list back to the start"""
+        url = reverse('weather_city_list')
+        last_cursor = self.client.get(url).context['page_obj'].last_cursor
+        response = self.client.get(url, {'cursor': last_cursor})
+        names = [city.name for city in response.context['object_list']]
+        self.assertEqual(names, [f"City {index:02d}" for index in range(15, 25)])
+        self.assertIsNone(response.context['page_obj'].next_cursor)
+
+        previous = response.context['page_obj'].previous_cursor
+        response = self.client.get(url, {'cursor': previous})
+        self.assertEqual(response.context['object_list'][0].name, "City 05")
+
+    def test_deep_page_has_no_count_or_offset(self):
+        """Test that a page is a single range read"""
+        url = reverse('search_history')
+        cursor = self.client.get(url).context['page_obj'].next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'cursor': cursor})
+        sql = ' '.join(query['sql'] for query in queries.captured_queries).upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_invalid_cursor_is_404(self):
+        """Test that a malformed cursor is a 404 like an invalid page number"""
+        self.assertEqual(self.client.get(reverse('search_history'), {'cursor': 'garbage'}).status_code, 404)
+
+
+class RecentSearchesTest(TestCase):
+    """Test Case for the de-duplicated recent searches"""
+
+    def setUp(self):
+        self.paris = City.objects.create(name="Paris", country="FR")
+        self.rome = City.objects.create(name="Rome", country="IT")
+        for city in (self.paris, self.rome, self.paris, self.paris):
+            record_search(city)
+
+    def test_record_search_stamps_city(self):
+        """Test that every search is logged and the newest time is kept on the city"""
+        self.paris.refresh_from_db()
+        newest = SearchHistory.objects.filter(city=self.paris).latest('searched_at')
+        self.assertEqual(self.paris.last_searched_at, newest.searched_at)
+        self.assertEqual(SearchHistory.objects.count(), 4)
+
+    def test_index_shows_each_city_once(self):
+        """Test that the home page lists unique cities, newest search first, in one query"""
+        payload = owm_payload(temp=15.0, humidity=70, pressure=1018, wind_speed=2.0)
+        record_weather(self.paris, payload)
+        record_weather(self.rome, payload)
+        with mock.patch('WEATHERAPP.views.fetch_json') as fetch, self.assertNumQueries(1):
+            response = self.client.get(reverse('weather_index'))
+            recent = list(response.context['recent_searches'])
+        fetch.assert_not_called()
+        self.assertEqual(recent, [self.paris, self.rome])
+
+    def test_search_history_lists_unique_cities(self):
+        """Test that the search history page has one row per city"""
+        response = self.client.get(reverse('search_history'))
+        self.assertEqual(list(response.context['search_records']), [self.paris, self.rome])
+
+
+class SearchBufferTest(TestCase):
+    """Test Case for buffered search history writes"""
+
+    def setUp(self):
+        self.paris = City.objects.create(name="Paris", country="FR")
+        self.rome = City.objects.create(name="Rome", country="IT")
+
+    def test_write_searches_batches(self):
+        """Test that a batch is one INSERT and one counter UPDATE per city"""
+        now = timezone.now()
+        events = [
+            (self.paris.id, now - timedelta(minutes=2)),
+            (self.rome.id, now - timedelta(minutes=1)),
+            (self.paris.id, now),
+            (self.paris.id, now - timedelta(minutes=5)),
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(write_searches(events), 4)
+        statements = [query['sql'].split()[0] for query in queries.captured_queries]
+        self.assertEqual(statements.count('INSERT'), 1)
+        self.assertEqual(statements.count('UPDATE'), 2)
+
+        self.paris.refresh_from_db()
+        self.assertEqual(self.paris.search_count, 3)
+        self.assertEqual(self.paris.last_searched_at, now)
+        self.assertEqual(SearchHistory.objects.filter(city=self.paris).earliest('searched_at').searched_at,
+                         now - timedelta(minutes=5))
+
+    def test_out_of_order_flush_keeps_newest(self):
+        """Test that an older batch never moves last_searched_at backwards"""
+        now = timezone.now()
+        write_searches([(self.paris.id, now)])
+        write_searches([(self.paris.id, now - timedelta(hours=1))])
+        self.paris.refresh_from_db()
+        self.assertEqual(self.paris.last_searched_at, now)
+        self.assertEqual(self.paris.search_count, 2)
+
+    def test_deleted_city_is_dropped(self):
+        """Test that events for a city deleted before the flush are skipped"""
+        rome_id = self.rome.id
+        self.rome.delete()
+        self.assertEqual(write_searches([(rome_id, timezone.now()), (self.paris.id, timezone.now())]), 1)
+
+    def test_buffer_flushes_when_full(self):
+        """Test that reaching MAX_EVENTS hands a flush to the executor"""
+        executor = mock.Mock()
+        buffer = SearchBuffer(executor, options={'MAX_EVENTS': 2, 'FLUSH_INTERVAL': None})
+        buffer.add(self.paris.id)
+        executor.submit.assert_not_called()
+        buffer.add(self.rome.id)
+        executor.submit.assert_called_once()
+        self.assertEqual(SearchHistory.objects.count(), 0)
+
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(SearchHistory.objects.count(), 2)
+
+    def test_failed_flush_requeues(self):
+        """Test that events survive a failed flush"""
+        buffer = SearchBuffer(mock.Mock(), options={'MAX_EVENTS': 10, 'FLUSH_INTERVAL': None})
+        buffer.add(self.paris.id)
+        with mock.patch('WEATHERAPP.searches.write_searches', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                buffer.flush()
+        self.assertEqual(len(buffer), 1)
+
+    def test_search_view_does_not_write_history(self):
+        """Test that a search only queues an event"""
+        payload = owm_payload(
+            temp=12.0, humidity=75, pressure=1020, condition='Clouds', description='broken clouds',
+            wind_speed=4.0, clouds=60,
+            name='Paris', sys={'country': 'FR'}, coord={'lat': 48.85, 'lon': 2.35},
+        )
+        with mock.patch('WEATHERAPP.views.get_weather_data', return_value=payload), \
+                mock.patch('WEATHERAPP.views.search_buffer') as buffer:
+            response = self.client.post(reverse('weather_index'), {'search': '1', 'city_name': 'Paris'})
+        self.assertRedirects(response, reverse('weather_city_detail', args=[self.paris.id]),
+                             fetch_redirect_response=False)
+        buffer.add.assert_called_once_with(self.paris.id)
+        self.assertFalse(SearchHistory.objects.exists())
+
+    def test_search_for_known_city_writes_nothing(self):
+        """Test that searching a stored city issues no write queries"""
+        with mock.patch('WEATHERAPP.views.fetch_json') as fetch, \
+                mock.patch('WEATHERAPP.views.search_buffer') as buffer, \
+                CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('weather_index'), {'search': '1', 'city_name': 'paris'})
+        writes = [query['sql'] for query in queries.captured_queries
+                  if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(writes, [])
+        fetch.assert_not_called()
+        buffer.add.assert_called_once_with(self.paris.id)
+
+    def test_close_flushes_pending_events(self):
+        """Test that close() (run at exit) writes what is still buffered"""
+        buffer = SearchBuffer(mock.Mock(), options={'MAX_EVENTS': 10, 'FLUSH_INTERVAL': None})
+        buffer.add(self.paris.id)
+        with mock.patch('WEATHERAPP.searches.close_old_connections'):
+            buffer.close()
+        self.assertEqual(SearchHistory.objects.filter(city=self.paris).count(), 1)
+
+    def test_migration_backfills_search_count(self):
+        """Test that migration 0009 counts searches stored before it"""
+        record_search(self.paris)
+        record_search(self.paris)
+        City.objects.update(search_count=0)
+
+        importlib.import_module('WEATHERAPP.migrations.0009_buffered_search_history').backfill_search_count(apps, None)
+
+        self.paris.refresh_from_db()
+        self.assertEqual(self.paris.search_count, 2)
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Performance regression suite: every view in WEATHERAPP/urls.py has a
+    budget of SQL queries, checked against a fixture with more cities than
+    fit on one page and the upstream API mocked. A view that starts issuing
+    a query per row (N+1) exceeds its budget. Query time is not checked: it
+    depends on the machine, and the counts already catch the regressions.
+    """
+
+    CITIES = 12
+
+    # url name -> (method, query/post data, max queries)
+    BUDGETS = {
+        'weather_index': ('get', {}, 1),
+        'weather_city_list': ('get', {}, 2),
+        'search_history': ('get', {}, 1),
+        'favorites': ('get', {}, 2),
+        'weather_city_detail': ('get', {}, 4),
+        'weather_refresh': ('get', {}, 8),
+        'toggle_favorite': ('post', {}, 3),
+        'get_hourly_data': ('get', {}, 2),
+        'weather_updates': ('get', {'since': 0}, 1),
+        'cache_stats': ('get', {}, 0),
+        'api_bulk_current': ('get', {}, 1),
+        'api_bulk_forecast': ('get', {}, 1),
+        'api_current': ('get', {}, 1),
+        'api_forecast': ('get', {}, 1),
+        'api_history': ('get', {}, 2),
+        # Last, as it removes its city
+        'weather_city_delete': ('post', {}, 8),
+    }
+
+    def setUp(self):
+        caches['weather'].clear()
+        self.cities = [
+            City.objects.create(name=f"Budget {index}", country="XX", latitude=index, longitude=index)
+            for index in range(self.CITIES)
+        ]
+        with WeatherDataWriter() as writer:
+            for city in self.cities:
+                for _ in range(3):
+                    writer.add(weather_record_from_payload(city, owm_payload(name=city.name, sys={'country': 'XX'}, coord={'lat': 1.0, 'lon': 1.0})))
+        for city in self.cities[:5]:
+            Favorite.objects.create(city=city)
+        write_searches([(city.id, timezone.now()) for city in self.cities])
+        self.city = self.cities[0]
+
+    def fake_upstream(self, url, params):
+        if url == views.FORECAST_URL:
+            return {'list': []}
+        if url == views.AIRPOLLUTION_URL:
+            return {'list': [{'main': {'aqi': 1}, 'components': {}}]}
+        if url == views.UVI_URL:
+            return {'value': 1.0}
+        return owm_payload(name=params.get('q', 'Somewhere'), sys={'country': 'XX'}, coord={'lat': 1.0, 'lon': 1.0})
+
+    def request_for(self, name):
+        method, data, _ = self.BUDGETS[name]
+        data = dict(data)
+        pattern = next(pattern for pattern in urlpatterns if pattern.name == name)
+        city = self.cities[-1] if name == 'weather_city_delete' else self.city
+        kwargs = {key: city.id for key in pattern.pattern.converters}
+        if name.startswith('api_bulk') or name == 'weather_updates':
+            data['ids'] = ','.join(str(city.id) for city in self.cities)
+        return method, reverse(name, kwargs=kwargs), data
+
+    def test_every_view_has_a_budget(self):
+        """Test that new URLs cannot be added without a query budget"""
+        self.assertEqual({pattern.name for pattern in urlpatterns}, set(self.BUDGETS))
+
+    def test_views_stay_within_budget(self):
+        """Test the query count of every view"""
+        for name, (_, _, max_queries) in self.BUDGETS.items():
+            with self.subTest(view=name), \
+                    mock.patch('WEATHERAPP.views.fetch_json', side_effect=self.fake_upstream), \
+                    mock.patch('WEATHERAPP.views.background_refresher'):
+                method, url, data = self.request_for(name)
+                if method == 'get':
+                    # Warm the upstream cache so only the database is measured
+                    self.client.get(url, data)
+                with CaptureQueriesContext(connection) as queries:
+                    response = getattr(self.client, method)(url, data)
+                self.assertLess(response.status_code, 400)
+                executed = [query for query in queries.captured_queries
+                            if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]
+                self.assertLessEqual(
+                    len(executed), max_queries,
+                    '\n'.join(query['sql'] for query in executed)
+                )
+
+    def test_budgets_do_not_scale_with_rows(self):
+        """Test that list views issue the same number of queries for more rows"""
+
+        def count(name):
+            method, url, data = self.request_for(name)
+            with CaptureQueriesContext(connection) as queries:
+                getattr(self.client, method)(url, data)
+            return len(queries.captured_queries)
+
+        names = ['weather_index', 'weather_city_list', 'search_history', 'favorites', 'api_bulk_current']
+        with mock.patch('WEATHERAPP.views.fetch_json', side_effect=self.fake_upstream):
+            before = {name: count(name) for name in names}
+            extra = [City.objects.create(name=f"Extra {index}") for index in range(5)]
+            for city in extra:
+                record_weather(city, owm_payload(name=city.name, sys={'country': 'XX'}, coord={'lat': 1.0, 'lon': 1.0}))
+                Favorite.objects.create(city=city)
+            write_searches([(city.id, timezone.now()) for city in extra])
+            self.cities += extra
+            after = {name: count(name) for name in names}
+        self.assertEqual(before, after)
+
+
+class FakeOWMServerTest(TestCase):
+    """Test Case for the local OpenWeatherMap stand-in"""
+
+    def setUp(self):
+        caches['weather'].clear()
+        self.server = FakeOWMServer().start()
+        self.addCleanup(self.server.stop)
+
+    def point_app_at(self, server):
+        root = server.api_root
+        return mock.patch.multiple(
+            'WEATHERAPP.views',
+            BASE_URL=f'{root}/weather', FORECAST_URL=f'{root}/forecast',
+            AIRPOLLUTION_URL=f'{root}/air_pollution', UVI_URL=f'{root}/uvi',
+            GROUP_URL=f'{root}/group',
+        )
+
+    def test_app_fetches_from_fake_server(self):
+        """Test that every fetcher works end to end against synthetic payloads"""
+        with self.point_app_at(self.server):
+            weather = get_weather_data('Oslo')
+            forecast = get_forecast('Oslo')
+            aqi = get_aqi_data(59.9, 10.7)
+            uvi = get_uvi_data(59.9, 10.7)
+        self.assertEqual(weather['name'], 'Oslo')
+        self.assertEqual(len(forecast['hourly']), 8)
+        self.assertIn(aqi['aqi'], range(1, 6))
+        self.assertIn('value', uvi)
+
+    def test_payloads_are_deterministic(self):
+        """Test that the same query always gets the same weather"""
+        self.assertEqual(fake_weather({'q': 'Oslo'}, now=0), fake_weather({'q': 'oslo'}, now=0) | {'name': 'Oslo'})
+        self.assertNotEqual(fake_weather({'q': 'Oslo'}, now=0)['main'], fake_weather({'q': 'Lima'}, now=0)['main'])
+
+    def test_error_and_throttle_injection(self):
+        """Test that 500s and 429s (with Retry-After) can be injected"""
+        with FakeOWMServer(throttle_rate=1.0) as throttled, FakeOWMServer(error_rate=1.0) as failing:
+            response = requests.get(f'{throttled.api_root}/weather', params={'q': 'Oslo'}, timeout=5)
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response.headers['Retry-After'], '1')
+            self.assertEqual(requests.get(f'{failing.api_root}/weather', timeout=5).status_code, 500)
+            self.assertEqual(throttled.counts, {('weather', 429): 1})
+
+    def test_latency_injection(self):
+        """Test that configured latency is added to responses"""
+        with FakeOWMServer(latency=0.1) as slow:
+            started = time.monotonic()
+            requests.get(f'{slow.api_root}/uvi', params={'lat': 1, 'lon': 2}, timeout=5)
+            self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+    def test_record_and_replay(self):
+        """Test that recorded payloads are saved and served back"""
+        directory = tempfile.mkdtemp()
+        params = {'q': 'Oslo', 'appid': 'secret', 'units': 'metric'}
+        with FakeOWMServer(record_dir=directory, upstream_root=self.server.api_root) as recorder:
+            recorded = requests.get(f'{recorder.api_root}/weather', params=params, timeout=5).json()
+        saved = list(Path(directory).glob('*.json'))
+        self.assertEqual(len(saved), 1)
+
+        saved[0].write_text(json.dumps({**recorded, 'name': 'Recorded Oslo'}))
+        with FakeOWMServer(replay_dir=directory) as replayer:
+            # The API key is not part of the recording's identity
+            replayed = requests.get(f'{replayer.api_root}/weather', params={**params, 'appid': 'other'}, timeout=5).json()
+            fallback = requests.get(f'{replayer.api_root}/weather', params={'q': 'Lima'}, timeout=5).json()
+        self.assertEqual(replayed['name'], 'Recorded Oslo')
+        self.assertEqual(fallback['name'], 'Lima')
+
+
+class LoadDriverTest(TestCase):
+    """Test Case for the load-test harness"""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_run_load_reports_per_path(self):
+        """Test that the driver counts requests, errors and latency per path"""
+        with FakeOWMServer() as server, FakeOWMServer(error_rate=1.0) as failing:
+            summary, elapsed = run_load(
+                server.api_root, ['/weather?q=Oslo', '/uvi?lat=1&lon=2'], concurrency=4, requests_per_path=10,
+            )
+            errors, _ = run_load(failing.api_root, ['/weather'], concurrency=2, requests_per_path=3)
+        self.assertEqual(summary['/weather?q=Oslo']['requests'], 10)
+        self.assertEqual(summary['/uvi?lat=1&lon=2']['errors'], 0)
+        self.assertLessEqual(summary['/uvi?lat=1&lon=2']['p50_ms'], summary['/uvi?lat=1&lon=2']['p99_ms'])
+        self.assertGreater(summary['/weather?q=Oslo']['rps'], 0)
+        self.assertEqual(errors['/weather']['errors'], 3)
+
+
+class BenchmarkSuiteTest(TestCase):
+    """Test Case for the micro-benchmark suite"""
+
+    def setUp(self):
+        caches['weather'].clear()
+
+    def test_recorded_payloads_parse(self):
+        """Test that the fixed payloads exercise the full forecast parser"""
+        fixture = BenchmarkFixture()
+        self.assertEqual(len(fixture.forecast['hourly']), 8)
+        self.assertGreaterEqual(len(fixture.forecast['daily']), 5)
+        context = fixture.detail_context()
+        self.assertIsNotNone(context['aqi_data'])
+        self.assertEqual(context['hourly_forecast'], fixture.forecast['hourly'])
+
+    def test_cases_run(self):
+        """Test that every case runs and reports timings"""
+        results = run_benchmarks(repeat=1, number=1)
+        self.assertEqual(set(results), {
+            'decode_weather', 'decode_forecast', 'parse_forecast', 'hourly_json',
+            'current_weather_dict', 'detail_context', 'render_city_detail',
+        })
+        self.assertTrue(all(timing['best'] > 0 for timing in results.values()))
+        with self.assertRaises(ValueError):
+            run_benchmarks(['no_such_case'])
+
+    def test_compare_flags_regressions(self):
+        """Test relative change against the previous run"""
+        changes = compare(
+            {'a': {'best': 1.2}, 'b': {'best': 1.0}, 'c': {'best': 1.0}},
+            {'a': {'best': 1.0}, 'b': {'best': 1.0}},
+        )
+        self.assertAlmostEqual(changes['a'][0], 0.2)
+        self.assertTrue(changes['a'][1])
+        self.assertFalse(changes['b'][1])
+        self.assertNotIn('c', changes)
+
+    def test_command_records_history(self):
+        """Test that runs are appended to the results file"""
+        output = Path(tempfile.mkdtemp()) / 'results.jsonl'
+        for _ in range(2):
+            out = StringIO()
+            call_command('benchmark', 'decode_weather', repeat=1, output=str(output), stdout=out)
+        runs = [json.loads(line) for line in output.read_text().splitlines()]
+        self.assertEqual(len(runs), 2)
+        self.assertIn('decode_weather', runs[1]['results'])
+        self.assertIn('Compared with', out.getvalue())
+
+
+class GroupFetchTest(TestCase):
+    """Test Case for fetching current weather by upstream city id in groups"""
+
+    def setUp(self):
+        caches['weather'].clear()
+        self.cities = [City.objects.create(name=f"Town {i}", owm_id=1000 + i) for i in range(45)]
+        self.unknown = City.objects.create(name="Nowhere")
+
+    def group_fetch(self, url, params):
+        if 'id' in params:
+            return {'list': [owm_payload(id=int(owm_id), name=f"Town {int(owm_id) - 1000}")
+                             for owm_id in params['id'].split(',')]}
+        return owm_payload(name=params['q'])
+
+    def test_known_ids_fetched_twenty_per_call(self):
+        """Test that 45 known cities cost 3 group calls plus one by-name call"""
+        with mock.patch('WEATHERAPP.views.fetch_json', side_effect=self.group_fetch) as fetch:
+            results = get_bulk_weather_data(self.cities + [self.unknown])
+        urls = [call.args[0] for call in fetch.call_args_list]
+        self.assertEqual(urls.count(GROUP_URL), 3)
+        self.assertEqual(len(urls), 4)
+        self.assertEqual(len(results), 46)
+        self.assertEqual(results[self.cities[44].id]['name'], "Town 44")
+
+    def test_group_results_cached_per_city(self):
+        """Test that group payloads serve later single-city lookups"""
+        with mock.patch('WEATHERAPP.views.fetch_json', side_effect=self.group_fetch) as fetch:
+            get_bulk_weather_data(self.cities[:5])
+            self.assertEqual(get_weather_data(self.cities[3])['name'], "Town 3")
+        self.assertEqual(fetch.call_count, 1)
+
+    def test_bulk_fetch_counts_each_miss_once(self):
+        """Test that group fetches show up in the weather cache stats"""
+        cache_stats.reset()
+        with mock.patch('WEATHERAPP.views.fetch_json', side_effect=self.group_fetch):
+            get_bulk_weather_data(self.cities[:5] + [self.unknown])
+            get_bulk_weather_data(self.cities[:5] + [self.unknown])
+        self.assertEqual(cache_stats.snapshot()['weather'], {'hits': 6, 'misses': 6, 'coalesced': 0})
+
+    def test_ids_missing_from_response_are_left_out(self):
+        """Test that cities absent from a group response count as failed"""
+        with mock.patch('WEATHERAPP.views.fetch_json', return_value={'list': []}):
+            self.assertEqual(get_bulk_weather_data(self.cities[:3]), {})
+
+    def test_writer_learns_upstream_ids(self):
+        """Test that stored observations record the city's upstream id once"""
+        with WeatherDataWriter() as writer:
+            writer.add(weather_record_from_payload(self.unknown, owm_payload(id=2643743)))
+        self.unknown.refresh_from_db()
+        self.assertEqual(self.unknown.owm_id, 2643743)
+
+    def test_coordinate_lookups_keep_upstream_id(self):
+        """Test that a fetch by coordinates never sets or changes the upstream id"""
+        located = City.objects.create(name="Located", latitude=51.51, longitude=-0.13)
+        known = City.objects.create(name="Known", latitude=48.85, longitude=2.35, owm_id=2988507)
+        with WeatherDataWriter() as writer:
+            writer.add(weather_record_from_payload(located, owm_payload(id=2643743)))
+            writer.add(weather_record_from_payload(known, owm_payload(id=6455259)))
+        located.refresh_from_db()
+        known.refresh_from_db()
+        self.assertIsNone(located.owm_id)
+        self.assertEqual(known.owm_id, 2988507)
+
+    def test_update_command_uses_groups(self):
+        """Test that update_weather makes one upstream call per group"""
+        out = StringIO()
+        with mock.patch('WEATHERAPP.views.fetch_json', side_effect=self.group_fetch) as fetch:
+            call_command('update_weather', workers=2, stdout=out)
+        self.assertEqual(fetch.call_count, 4)
+        self.assertEqual(WeatherData.objects.count(), 46)
+        self.assertIn('4 upstream calls', out.getvalue())
+
+    def test_fake_server_group_endpoint(self):
+        """Test that the fake upstream serves groups and rejects oversized ones"""
+        with FakeOWMServer() as server:
+            ok = requests.get(f'{server.api_root}/group', params={'id': '1,2,3'}, timeout=5)
+            too_many = requests.get(f'{server.api_root}/group',
+                                    params={'id': ','.join(str(i) for i in range(21))}, timeout=5)
+        self.assertEqual([item['id'] for item in ok.json()['list']], [1, 2, 3])
+        self.assertEqual(too_many.status_code, 400)
+
+
+class LocationFetchTest(TestCase):
+    """Test Case for fetching known cities by coordinates or upstream id"""
+
+    def setUp(self):
+        caches['weather'].clear()
+        self.payload = owm_payload(
+            temp=11.0, humidity=80, pressure=1009, condition='Rain', description='light rain',
+            wind_speed=5.0, clouds=90,
+            id=2643743, name='London', sys={'country': 'GB'}, coord={'lat': 51.5085, 'lon': -0.1257},
+        )
+
+    def test_location_precedence(self):
+        """Test that coordinates win over the upstream id, and the id over the name"""
+        self.assertEqual(location_params(City(name="A", latitude=51.5085, longitude=-0.1257, owm_id=1)),
+                         {'lat': 51.51, 'lon': -0.13})
+        self.assertEqual(location_params(City(name="A", owm_id=1)), {'id': 1})
+        self.assertEqual(location_params(City(name="A")), {'q': "A"})
+        self.assertEqual(location_params("A"), {'q': "A"})
+
+    def test_spelling_variants_share_cache_entries(self):
+        """Test that cities at the same rounded coordinates share one fetch"""
+        london = City(name="London", latitude=51.5085, longitude=-0.1257)
+        variant = City(name="Londres", latitude=51.5074, longitude=-0.1278)
+        with mock.patch('WEATHERAPP.views.fetch_json', return_value=self.payload) as fetch:
+            get_weather_data(london)
+            get_weather_data(variant)
+        self.assertEqual(fetch.call_count, 1)
+        self.assertNotIn('q', fetch.call_args.args[1])
+
+    def test_search_for_known_city_skips_name_lookup(self):
+        """Test that searching a stored city makes no upstream call nor claims a fetch"""
+        london = City.objects.create(name="London", latitude=51.5085, longitude=-0.1257)
+        with mock.patch('WEATHERAPP.views.fetch_json', return_value=self.payload) as fetch, \
+                mock.patch('WEATHERAPP.views.search_buffer'):
+            response = self.client.post(reverse('weather_index'), {'search': '1', 'city_name': 'london'})
+        self.assertRedirects(response, reverse('weather_city_detail', args=[london.id]),
+                             fetch_redirect_response=False)
+        fetch.assert_not_called()
+        self.assertEqual([str(message) for message in get_messages(response.wsgi_request)],
+                         ["Showing weather for London"])
+
+    def test_search_matches_upstream_id(self):
+        """Test that a new spelling resolving to a known upstream id reuses that city"""
+        london = City.objects.create(name="London", owm_id=2643743)
+        with mock.patch('WEATHERAPP.views.fetch_json', return_value=self.payload), \
+                mock.patch('WEATHERAPP.views.search_buffer'):
+            response = self.client.post(reverse('weather_index'), {'search': '1', 'city_name': 'Londres'})
+        self.assertRedirects(response, reverse('weather_city_detail', args=[london.id]),
+                             fetch_redirect_response=False)
+        self.assertEqual(City.objects.count(), 1)
+
+    def test_writer_fills_missing_coordinates(self):
+        """Test that a city added without coordinates gets them from its first observation"""
+        city = City.objects.create(name="London")
+        record_weather(city, self.payload)
+        city.refresh_from_db()
+        self.assertEqual((city.latitude, city.longitude, city.owm_id), (51.5085, -0.1257, 2643743))
+
+
+class FreshWriteFetchTest(TestCase):
+    """Test Case checking write paths record new observations, not cached copies"""
+
+    def setUp(self):
+        caches['weather'].clear()
+        self.city = City.objects.create(name="Lima", country="PE", latitude=-12.05, longitude=-77.04)
+        self.payload = owm_payload(
+            temp=19.0, humidity=80, pressure=1013, condition='Clouds', description='overcast clouds',
+            wind_speed=3.0, clouds=100,
+            id=3936456, name='Lima', sys={'country': 'PE'}, coord={'lat': -12.05, 'lon': -77.04},
+        )
+
+    def test_refresh_fetches_upstream_every_time(self):
+        """Test that each refresh is one upstream call and one stored row"""
+        with mock.patch('WEATHERAPP.views.fetch_json', return_value=self.payload) as fetch:
+            for _ in range(3):
+                self.client.get(reverse('weather_refresh', args=[self.city.id]))
+        self.assertEqual(fetch.call_count, 3)
+        self.assertEqual(WeatherData.objects.filter(city=self.city).count(), 3)
+
+    def test_refresh_restores_cache_entry(self):
+        """Test that readers see the refreshed payload without another call"""
+        with mock.patch('WEATHERAPP.views.fetch_json', return_value=self.payload) as fetch:
+            get_weather_data(self.city)
+            get_weather_data(self.city, fresh=True)
+            get_weather_data(self.city)
+        self.assertEqual(fetch.call_count, 2)
+
+
 # Run tests with: python manage.py test WEATHERAPP
 # Run specific test: python manage.py test WEATHERAPP.tests.CityModelTest
 # Run with coverage: coverage run --source='.' manage.py test WEATHERAPP
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.IndexView.as_view(), name='weather_index'),
@@ -11,4 +11,13 @@ urlpatterns = [
     path('city/<int:pk>/refresh/', views.refresh_weather, name='weather_refresh'),
     path('city/<int:city_id>/favorite/toggle/', views.toggle_favorite, name='toggle_favorite'),
     path('city/<int:city_id>/hourly/', views.get_hourly_data, name='get_hourly_data'),
+    path('updates/', views.weather_updates, name='weather_updates'),
+    path('cache-stats/', views.cache_stats_view, name='cache_stats'),
+
+    # Read-only JSON API
+    path('api/v1/current/', api.BulkCurrentWeatherAPIView.as_view(), name='api_bulk_current'),
+    path('api/v1/forecast/', api.BulkForecastAPIView.as_view(), name='api_bulk_forecast'),
+    path('api/v1/cities/<int:pk>/current/', api.CurrentWeatherAPIView.as_view(), name='api_current'),
+    path('api/v1/cities/<int:pk>/forecast/', api.ForecastAPIView.as_view(), name='api_forecast'),
+    path('api/v1/cities/<int:pk>/history/', api.WeatherHistoryAPIView.as_view(), name='api_history'),
 ]
@@ -1,130 +1,353 @@
+import atexit
+import hashlib
 import requests
-from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse
 from django.contrib import messages
-from django.views.decorators.http import require_http_methods
+from django.db.models import Count, Exists, F, Max, OuterRef
+from django.views.decorators.http import condition, require_http_methods
 from django.views.generic import ListView, DetailView
 from django.views import View
 from django.utils.decorators import method_decorator
 
-from .models import City, WeatherData, SearchHistory, Favorite
+from .models import City, LatestWeather, Favorite
 from .forms import CityForm, SearchWeatherForm
+from .cache import cached_json, cached_json_many, cache_stats, get_cache_version, refresh_json, store_json_many
+from .http_client import get_json
+from .freshness import FRESH, STALE, EXPIRED, BackgroundRefresher, get_freshness
+from .ingest import WeatherDataWriter, latest_from_record, record_weather, weather_record_from_payload
+from .pagination import CURSOR_PARAM, KeysetPaginationMixin
+from .searches import SearchBuffer
 
 # OpenWeatherMap API key - get your free key from https://openweathermap.org/api
 API_KEY = '05edc8fd06245d4b2c734037613e3877'
-BASE_URL = 'https://api.openweathermap.org/data/2.5/weather'
-FORECAST_URL = 'https://api.openweathermap.org/data/2.5/forecast'
+# Point OPENWEATHERMAP_API_ROOT at `manage.py fake_owm` for local benchmarks
+API_ROOT = getattr(settings, 'OPENWEATHERMAP_API_ROOT', 'https://api.openweathermap.org/data/2.5').rstrip('/')
+BASE_URL = f'{API_ROOT}/weather'
+FORECAST_URL = f'{API_ROOT}/forecast'
 
 # Additional OpenWeatherMap endpoints
-AIRPOLLUTION_URL = 'http://api.openweathermap.org/data/2.5/air_pollution'
-UVI_URL = 'http://api.openweathermap.org/data/2.5/uvi'
+AIRPOLLUTION_URL = f'{API_ROOT}/air_pollution'
+UVI_URL = f'{API_ROOT}/uvi'
+# Current weather for several city ids in one call (at most GROUP_MAX_IDS)
+GROUP_URL = f'{API_ROOT}/group'
+GROUP_MAX_IDS = 20
 
+# Shared pool for running upstream calls in parallel (bounded so a burst of
+# page views cannot spawn an unbounded number of threads)
+UPSTREAM_MAX_WORKERS = 16
+upstream_executor = ThreadPoolExecutor(
+    max_workers=UPSTREAM_MAX_WORKERS,
+    thread_name_prefix='owm-fetch',
+)
 
-def get_weather_data(city_name):
-    """Fetch weather data from OpenWeatherMap API"""
+# Coalesced background refreshes for stale observations
+background_refresher = BackgroundRefresher(upstream_executor)
+
+# Search history events, written in batches off the request path (and
+# at exit, so a worker recycle does not drop them)
+search_buffer = SearchBuffer(upstream_executor)
+atexit.register(search_buffer.close)
+
+# Maximum in-flight requests for one bulk (multi-city) fetch
+BULK_MAX_CONCURRENCY = 8
+
+# Coordinates are rounded to this many decimals (about 1 km) in upstream
+# queries and cache keys
+COORD_DECIMALS = 2
+
+
+def map_concurrently(func, items, max_concurrency=BULK_MAX_CONCURRENCY):
+    """
+    Run func(item) for every item on the shared upstream pool, keeping at
+    most max_concurrency calls in flight. Returns {item: result}.
+    If a call raises, no further items are submitted, calls not yet started
+    are cancelled and running ones are waited for before the error is
+    re-raised, so nothing is left working on the shared pool.
+    """
+    results = {}
+    pending = {}
+    items = iter(items)
+    
     try:
-        params = {
-            'q': city_name,
-            'appid': API_KEY,
-            'units': 'metric'  # Use Celsius
-        }
-        response = requests.get(BASE_URL, params=params, timeout=5)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        return None
+        while True:
+            for item in items:
+                pending[upstream_executor.submit(func, item)] = item
+                if len(pending) >= max_concurrency:
+                    break
+            if not pending:
+                return results
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        wait(pending)
+        raise
+
+
+def fetch_json(url, params):
+    """Perform a GET against an OpenWeatherMap endpoint and decode the JSON"""
+    return get_json(url, params)
+
+
+def coord_params(lat, lon):
+    """Rounded coordinates, so nearby spellings of a place share cache entries"""
+    return {'lat': round(lat, COORD_DECIMALS), 'lon': round(lon, COORD_DECIMALS)}
+
+
+# City fields location_params() reads; load at least these with only()
+LOCATION_FIELDS = ('name', 'latitude', 'longitude', 'owm_id')
 
 
-def get_forecast_data(city_name):
-    """Fetch 5-day forecast data from OpenWeatherMap API"""
+def location_params(city):
+    """
+    How to ask the upstream for a city: by coordinates once they are known,
+    else by upstream id, else by name. A bare name (a first search) is
+    always looked up by name.
+    """
+    if isinstance(city, str):
+        return {'q': city}
+    if city.latitude is not None and city.longitude is not None:
+        return coord_params(city.latitude, city.longitude)
+    if city.owm_id:
+        return {'id': city.owm_id}
+    return {'q': city.name}
+
+
+def weather_params(city):
+    """Query parameters for a current weather request (city or bare name)"""
+    return {
+        **location_params(city),
+        'appid': API_KEY,
+        'units': 'metric'  # Use Celsius
+    }
+
+
+def get_weather_data(city, fresh=False):
+    """
+    Fetch weather data from OpenWeatherMap API (city or bare name).
+    fresh=True skips the cache (and re-stores the entry); use it on paths
+    that record the result, so a cached payload is never stored twice.
+    """
     try:
-        params = {
-            'q': city_name,
-            'appid': API_KEY,
-            'units': 'metric',
-            'cnt': 40  # Get 5 days (8 forecasts per day for 3-hour intervals)
-        }
-        response = requests.get(FORECAST_URL, params=params, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Process forecast data - get one forecast per day (at midday)
-        daily_forecasts = {}
-        for forecast in data['list']:
-            from datetime import datetime
-            dt = datetime.fromtimestamp(forecast['dt'])
-            day_key = dt.strftime('%Y-%m-%d')
-            
-            # Use midday forecast (around 12:00)
-            if day_key not in daily_forecasts or dt.hour == 12 or (dt.hour < 12 and daily_forecasts[day_key]['hour'] > 12):
-                daily_forecasts[day_key] = {
-                    'dt': forecast['dt'],
-                    'date': dt,
-                    'hour': dt.hour,
-                    'temperature': forecast['main']['temp'],
-                    'temp_min': forecast['main']['temp_min'],
-                    'temp_max': forecast['main']['temp_max'],
-                    'humidity': forecast['main']['humidity'],
-                    'pressure': forecast['main']['pressure'],
-                    'description': forecast['weather'][0]['description'].title(),
-                    'main': forecast['weather'][0]['main'],
-                    'wind_speed': forecast['wind']['speed'],
-                    'cloudiness': forecast['clouds']['all'],
-                    'rain': forecast.get('rain', {}).get('3h', 0),
-                }
-        
-        # Sort by date and return first 10 days worth
-        sorted_forecasts = sorted(daily_forecasts.items())[:10]
-        return [forecast[1] for forecast in sorted_forecasts]
+        params = weather_params(city)
+        if fresh:
+            return refresh_json('weather', params, lambda: fetch_json(BASE_URL, params))
+        return cached_json('weather', params, lambda: fetch_json(BASE_URL, params))
     except requests.exceptions.RequestException as e:
-        return []
+        return None
 
 
-def get_hourly_forecast(city_name):
-    """Fetch hourly forecast for next 24 hours"""
+def group_params(owm_ids):
+    """Query parameters for a group (multi-id) current weather request"""
+    return {
+        'id': ','.join(str(owm_id) for owm_id in owm_ids),
+        'appid': API_KEY,
+        'units': 'metric',
+    }
+
+
+def get_group_weather_data(owm_ids):
+    """
+    Fetch current weather for up to GROUP_MAX_IDS upstream city ids in one
+    call. Returns {owm_id: data}; empty on API errors.
+    """
     try:
-        params = {
-            'q': city_name,
-            'appid': API_KEY,
-            'units': 'metric',
-            'cnt': 8  # Get next 24 hours (8 forecasts)
-        }
-        response = requests.get(FORECAST_URL, params=params, timeout=5)
-        response.raise_for_status()
-        data = response.json()
+        data = fetch_json(GROUP_URL, group_params(owm_ids))
+    except requests.exceptions.RequestException:
+        return {}
+    return {item['id']: item for item in data.get('list', []) if 'id' in item}
+
+
+def weather_request_batches(cities):
+    """
+    Split cities into upstream calls: cities with a known upstream id go
+    GROUP_MAX_IDS to a group call, the others are fetched one by one.
+    Returns a list of city tuples, one per call.
+    """
+    with_id = [city for city in cities if city.owm_id]
+    batches = [tuple(with_id[i:i + GROUP_MAX_IDS]) for i in range(0, len(with_id), GROUP_MAX_IDS)]
+    batches += [(city,) for city in cities if not city.owm_id]
+    return batches
+
+
+def fetch_weather_batch(batch, fresh=False):
+    """
+    Fetch one batch from weather_request_batches(). Group results are always
+    fetched upstream (one cache miss per city) and cached per city;
+    fresh=True also skips the cache for single cities. Returns
+    {city.id: data}; failed cities are left out.
+    """
+    if batch[0].owm_id:
+        for _ in batch:
+            cache_stats.record('weather', 'misses')
+        payloads = get_group_weather_data([city.owm_id for city in batch])
+        results = {city.id: payloads[city.owm_id] for city in batch if city.owm_id in payloads}
+        store_json_many('weather', [(weather_params(city), results[city.id]) for city in batch if city.id in results])
+        return results
+    data = get_weather_data(batch[0], fresh=fresh)
+    return {batch[0].id: data} if data else {}
+
+
+def get_bulk_weather_data(cities, max_concurrency=BULK_MAX_CONCURRENCY):
+    """
+    Fetch current weather for many cities at once.
+    Cities are de-duplicated, cache hits are served in one lookup and the
+    misses are fetched concurrently, 20 per call for cities whose upstream
+    id is known. Returns {city.id: data}; cities whose fetch failed are
+    left out.
+    """
+    unique_cities = {city.id: city for city in cities}
+    # Misses are recorded by fetch_weather_batch as they are fetched
+    results = cached_json_many(
+        'weather',
+        {city_id: weather_params(city) for city_id, city in unique_cities.items()},
+        record_misses=False,
+    )
+    
+    misses = [city for city_id, city in unique_cities.items() if city_id not in results]
+    fetched = map_concurrently(fetch_weather_batch, weather_request_batches(misses), max_concurrency)
+    for batch_results in fetched.values():
+        results.update(batch_results)
+    return results
+
+
+def refresh_city_weather(city):
+    """Fetch and store the current weather for a city. Returns the payload or None."""
+    data = get_weather_data(city, fresh=True)
+    if data and 'main' in data:
+        record_weather(city, data)
+        return data
+    return None
+
+
+def get_current_weather(cities):
+    """
+    Current conditions per city id, read from the LatestWeather projection.
+    Load cities with select_related('latest_weather') to keep this to one
+    query. Only cities that were never observed are fetched from the API,
+    and those results are stored so later page views come from the database.
+    Each entry carries its 'freshness' so cards can flag old observations.
+    """
+    weather_data = {}
+    missing = {}
+    for city in cities:
+        latest = getattr(city, 'latest_weather', None)
+        if latest is not None:
+            weather_data[city.id] = latest.as_dict()
+        else:
+            missing[city.id] = city
+    
+    if missing:
+        records = []
+        with WeatherDataWriter() as writer:
+            for city_id, data in get_bulk_weather_data(missing.values()).items():
+                if 'main' in data:
+                    record = weather_record_from_payload(missing[city_id], data)
+                    writer.add(record)
+                    records.append(record)
+        for record in records:
+            weather_data[record.city_id] = latest_from_record(record).as_dict()
+    
+    for weather in weather_data.values():
+        weather['freshness'] = get_freshness(weather['observed_at'])
+    return weather_data
+
+
+def parse_forecast(data):
+    """
+    Parse a 5-day/3-hour forecast response in a single pass.
+    Returns a dict of derived views:
+      'daily'  - one forecast per day (closest to midday), up to 10 days
+      'hourly' - the next 24 hours (first 8 three-hour slots)
+    """
+    daily_forecasts = {}
+    hourly_data = []
+    for index, forecast in enumerate(data['list']):
+        dt = datetime.fromtimestamp(forecast['dt'])
+        main = forecast['main']
+        weather = forecast['weather'][0]
+        description = weather['description'].title()
         
-        hourly_data = []
-        for forecast in data['list'][:8]:  # First 8 = next 24 hours
-            dt = datetime.fromtimestamp(forecast['dt'])
+        if index < 8:  # First 8 = next 24 hours
             hourly_data.append({
-                'time': dt.strftime('%H:%M'),
+                'time': f'{dt.hour:02d}:{dt.minute:02d}',
                 'hour': dt.hour,
-                'temperature': forecast['main']['temp'],
-                'feels_like': forecast['main'].get('feels_like'),
-                'humidity': forecast['main']['humidity'],
-                'description': forecast['weather'][0]['description'].title(),
-                'main': forecast['weather'][0]['main'],
+                'temperature': main['temp'],
+                'feels_like': main.get('feels_like'),
+                'humidity': main['humidity'],
+                'description': description,
+                'main': weather['main'],
                 'wind_speed': forecast['wind']['speed'],
                 'rain_prob': forecast.get('pop', 0) * 100,  # Probability of precipitation
                 'cloudiness': forecast['clouds']['all'],
             })
-        return hourly_data
+        
+        # Use midday forecast (around 12:00)
+        day_key = dt.date()
+        if day_key not in daily_forecasts or dt.hour == 12 or (dt.hour < 12 and daily_forecasts[day_key]['hour'] > 12):
+            daily_forecasts[day_key] = {
+                'dt': forecast['dt'],
+                'date': dt,
+                'hour': dt.hour,
+                'temperature': main['temp'],
+                'temp_min': main['temp_min'],
+                'temp_max': main['temp_max'],
+                'humidity': main['humidity'],
+                'pressure': main['pressure'],
+                'description': description,
+                'main': weather['main'],
+                'wind_speed': forecast['wind']['speed'],
+                'cloudiness': forecast['clouds']['all'],
+                'rain': forecast.get('rain', {}).get('3h', 0),
+            }
+    
+    # Sort by date and keep first 10 days worth
+    sorted_forecasts = sorted(daily_forecasts.items())[:10]
+    return {
+        'daily': [forecast[1] for forecast in sorted_forecasts],
+        'hourly': hourly_data,
+    }
+
+
+def forecast_params(city):
+    """Query parameters for a 5-day forecast request (city or bare name)"""
+    return {
+        **location_params(city),
+        'appid': API_KEY,
+        'units': 'metric',
+        'cnt': 40  # Get 5 days (8 forecasts per day for 3-hour intervals)
+    }
+
+
+def get_forecast(city):
+    """
+    Fetch the 5-day forecast once and return all derived views
+    (see parse_forecast). Both lists are empty on API errors.
+    """
+    try:
+        params = forecast_params(city)
+        data = cached_json('forecast', params, lambda: fetch_json(FORECAST_URL, params))
+        return parse_forecast(data)
     except requests.exceptions.RequestException as e:
-        return []
+        return {'daily': [], 'hourly': []}
+
+
+def point_params(lat, lon):
+    """Query parameters for the coordinate-only endpoints (air pollution, UV)"""
+    return {**coord_params(lat, lon), 'appid': API_KEY}
 
 
 def get_aqi_data(lat, lon):
     """Fetch Air Quality Index data"""
     try:
-        params = {
-            'lat': lat,
-            'lon': lon,
-            'appid': API_KEY
-        }
-        response = requests.get(AIRPOLLUTION_URL, params=params, timeout=5)
-        response.raise_for_status()
-        data = response.json()
+        params = point_params(lat, lon)
+        data = cached_json('air_pollution', params, lambda: fetch_json(AIRPOLLUTION_URL, params))
         
         if data['list']:
             aqi = data['list'][0]['main']['aqi']  # 1-5 scale
@@ -144,53 +367,132 @@ def get_aqi_data(lat, lon):
 def get_uvi_data(lat, lon):
     """Fetch UV Index data"""
     try:
-        params = {
-            'lat': lat,
-            'lon': lon,
-            'appid': API_KEY
-        }
-        response = requests.get(UVI_URL, params=params, timeout=5)
-        response.raise_for_status()
-        return response.json()
+        params = point_params(lat, lon)
+        return cached_json('uvi', params, lambda: fetch_json(UVI_URL, params))
     except requests.exceptions.RequestException as e:
         return None
 
 
+def conditional_on(compute_validators):
+    """
+    condition() decorator driven by one function returning
+    {'etag': ..., 'last_modified': ...} (or None to skip conditional
+    handling). The function runs once per request, before the view builds
+    any context, so a matching request costs only the validator lookup.
+    """
+    def validators(request, *args, **kwargs):
+        memo = request.__dict__.setdefault('_weather_validators', {})
+        if compute_validators not in memo:
+            memo[compute_validators] = compute_validators(request, *args, **kwargs)
+        return memo[compute_validators] or {}
+
+    return condition(
+        etag_func=lambda request, *args, **kwargs: validators(request, *args, **kwargs).get('etag'),
+        last_modified_func=lambda request, *args, **kwargs: validators(request, *args, **kwargs).get('last_modified'),
+    )
+
+
+def make_etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def city_detail_validators(request, pk):
+    """
+    Validators for the city detail page: the stored observation, favorite
+    state and the forecast, AQI and UVI cache versions. Only a fresh
+    observation gets a validator, so stale/expired pages still render and
+    refresh; nor does a request with pending flash messages, which must be
+    shown.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    city = (
+        City.objects.filter(pk=pk)
+        .annotate(
+            is_favorite=Exists(Favorite.objects.filter(city=OuterRef('pk'))),
+            observed_at=F('latest_weather__observed_at'),
+        )
+        .only(*LOCATION_FIELDS)
+        .first()
+    )
+    if city is None:
+        return None
+    observed_at, is_favorite = city.observed_at, city.is_favorite
+    if get_freshness(observed_at) != FRESH:
+        return None
+    versions = [get_cache_version('forecast', forecast_params(city))]
+    if city.latitude is not None and city.longitude is not None:
+        params = point_params(city.latitude, city.longitude)
+        versions += [get_cache_version('air_pollution', params), get_cache_version('uvi', params)]
+    if None in versions:
+        return None
+    return {
+        'etag': make_etag('city', pk, observed_at, is_favorite, *versions),
+        'last_modified': max(observed_at, datetime.fromtimestamp(max(versions), tz=dt_timezone.utc)),
+    }
+
+
+def city_list_validators(request):
+    """
+    Validators for the city list: the city set (count and newest id), the
+    last edit to any city and the latest observation time
+    """
+    stats = City.objects.aggregate(
+        count=Count('id'), newest=Max('id'), updated=Max('updated_at'), observed=Max('latest_weather__observed_at')
+    )
+    return {
+        'etag': make_etag(
+            'cities', request.GET.get(CURSOR_PARAM), stats['count'], stats['newest'], stats['updated'], stats['observed']
+        ),
+        'last_modified': max(filter(None, [stats['updated'], stats['observed']]), default=None),
+    }
+
+
+def favorites_validators(request):
+    """
+    Validators for the favorites page. Skipped while a favorite has no
+    stored observation, because rendering it will fetch one. The cards'
+    freshness is part of the ETag, so a card turning stale revalidates.
+    """
+    rows = list(Favorite.objects.order_by('pk').values_list('added_at', 'city__latest_weather__observed_at'))
+    observed = [observed_at for _, observed_at in rows]
+    if None in observed:
+        return None
+    freshness = [get_freshness(observed_at) for observed_at in observed]
+    added = max((added_at for added_at, _ in rows), default=None)
+    return {
+        'etag': make_etag('favorites', len(rows), added, max(observed, default=None), freshness),
+        'last_modified': max(filter(None, [added, *observed]), default=None),
+    }
+
+
+def hourly_data_validators(request, city_id):
+    """Validators for the hourly JSON endpoint: the forecast cache version"""
+    city = City.objects.filter(id=city_id).only(*LOCATION_FIELDS).first()
+    if city is None:
+        return None
+    forecast_version = get_cache_version('forecast', forecast_params(city))
+    if forecast_version is None:
+        return None
+    return {
+        'etag': make_etag('hourly', city_id, forecast_version),
+        'last_modified': datetime.fromtimestamp(forecast_version, tz=dt_timezone.utc),
+    }
+
+
 class IndexView(View):
     """Home page showing all tracked cities and their weather"""
     
     def get(self, request):
-        # Get recent searches instead of all cities
-        recent_searches = SearchHistory.objects.all()[:10]
-        weather_data = {}
+        # The 10 most recently searched cities, each once
+        recent_searches = list(
+            City.objects.filter(last_searched_at__isnull=False)
+            .select_related('latest_weather')
+            .order_by('-last_searched_at', '-id')[:10]
+        )
         
-        # Fetch current weather for recent searches
-        for search_record in recent_searches:
-            city = search_record.city
-            data = get_weather_data(city.name)
-            if data and 'main' in data:
-                weather_data[city.id] = {
-                    'temperature': data['main']['temp'],
-                    'feels_like': data['main'].get('feels_like'),
-                    'temp_min': data['main'].get('temp_min'),
-                    'temp_max': data['main'].get('temp_max'),
-                    'humidity': data['main']['humidity'],
-                    'description': data['weather'][0]['description'].title(),
-                    'main': data['weather'][0]['main'],
-                    'wind_speed': data['wind']['speed'],
-                    'wind_deg': data['wind'].get('deg'),
-                    'wind_gust': data['wind'].get('gust'),
-                    'pressure': data['main']['pressure'],
-                    'cloudiness': data['clouds']['all'],
-                    'visibility': data.get('visibility'),
-                    'sunrise': data['sys'].get('sunrise'),
-                    'sunset': data['sys'].get('sunset'),
-                    'country': data['sys'].get('country'),
-                    'coords': {
-                        'lat': data['coord']['lat'],
-                        'lon': data['coord']['lon']
-                    }
-                }
+        # Current weather for recent searches from the latest observations
+        weather_data = get_current_weather(recent_searches)
         
         search_form = SearchWeatherForm()
         
@@ -202,42 +504,55 @@ class IndexView(View):
         
         return render(request, 'WEATHERAPP/index.html', context)
     
+    def add_searched_city(self, city_name):
+        """
+        Look up a name upstream and return its City, created (with its first
+        observation) unless the upstream id is already known. None if the
+        lookup failed.
+        """
+        data = get_weather_data(city_name, fresh=True)
+        if not data or 'main' not in data:
+            return None
+        # The name typed may be a different spelling of a known city
+        if data.get('id'):
+            city = City.objects.filter(owm_id=data['id']).first()
+            if city is not None:
+                return city
+        city, created = City.objects.get_or_create(
+            name=data['name'],
+            defaults={
+                'country': data['sys'].get('country', ''),
+                'latitude': data['coord']['lat'],
+                'longitude': data['coord']['lon'],
+                'owm_id': data.get('id'),
+            }
+        )
+        if created:
+            record_weather(city, data)
+        return city
+    
     def post(self, request):
         """Handle city search and addition"""
         if 'search' in request.POST:
             search_form = SearchWeatherForm(request.POST)
             if search_form.is_valid():
                 city_name = search_form.cleaned_data['city_name']
-                data = get_weather_data(city_name)
+                # A known city needs no upstream call or weather write here:
+                # the detail page serves its stored observation and refreshes
+                # it if needed. Only new names are looked up by name.
+                city = City.objects.filter(name__iexact=city_name).first()
+                fetched = city is None
+                if fetched:
+                    city = self.add_searched_city(city_name)
                 
-                if data and 'main' in data:
-                    # Get or create city
-                    city, created = City.objects.get_or_create(
-                        name=data['name'],
-                        defaults={
-                            'country': data['sys'].get('country', ''),
-                            'latitude': data['coord']['lat'],
-                            'longitude': data['coord']['lon'],
-                        }
-                    )
-                    
-                    # Create weather record with comprehensive data
-                    WeatherData.objects.create(
-                        city=city,
-                        temperature=data['main']['temp'],
-                        feels_like=data['main'].get('feels_like'),
-                        humidity=data['main']['humidity'],
-                        pressure=data['main']['pressure'],
-                        weather_main=data['weather'][0]['main'],
-                        weather_description=data['weather'][0]['description'],
-                        wind_speed=data['wind']['speed'],
-                        cloudiness=data['clouds']['all'],
-                    )
+                if city is not None:
+                    # Add to search history (flushed in the background)
+                    search_buffer.add(city.id)
                     
-                    # Add to search history
-                    SearchHistory.objects.create(city=city)
-                    
-                    messages.success(request, f"Weather data for {city.name} fetched successfully!")
+                    if fetched:
+                        messages.success(request, f"Weather data for {city.name} fetched successfully!")
+                    else:
+                        messages.info(request, f"Showing weather for {city.name}")
                     # Redirect to the city detail page to show full report
                     return redirect('weather_city_detail', pk=city.id)
                 else:
@@ -252,98 +567,116 @@ class IndexView(View):
         return redirect('weather_index')
 
 
+@method_decorator(conditional_on(city_detail_validators), name='dispatch')
 class CityDetailView(DetailView):
     """Detailed weather view for a specific city"""
     model = City
     template_name = 'WEATHERAPP/city_detail.html'
     context_object_name = 'city'
     
+    def get_queryset(self):
+        """City with its latest observation and favorite flag in one query"""
+        return City.objects.select_related('latest_weather').annotate(
+            is_favorite=Exists(Favorite.objects.filter(city=OuterRef('pk')))
+        )
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        city = self.get_object()
+        city = self.object
         
-        # Get latest weather data
-        latest_weather = city.weather_records.first()
-        context['latest_weather'] = latest_weather
+        # Check if city is favorite
+        context['is_favorite'] = city.is_favorite
         
-        # Get weather history (last 10 records)
-        context['weather_history'] = city.weather_records.all()[:10]
+        # Stale-while-revalidate: a fresh or stale stored observation is
+        # rendered right away (stale ones are refreshed in the background);
+        # only an expired or missing one is fetched synchronously
+        stored = getattr(city, 'latest_weather', None)
+        freshness = get_freshness(stored.observed_at if stored else None)
+        context['freshness'] = freshness
+        if freshness == STALE:
+            background_refresher.schedule(city.id, refresh_city_weather, city)
         
-        # Check if city is favorite
-        context['is_favorite'] = Favorite.objects.filter(city=city).exists()
+        # Start all upstream calls together so page latency tracks the
+        # slowest single call instead of the sum of all of them
+        current_future = None
+        if freshness == EXPIRED:
+            current_future = upstream_executor.submit(get_weather_data, city, fresh=True)
+        forecast_future = upstream_executor.submit(get_forecast, city)
         
-        # Fetch current weather from API
-        current_data = get_weather_data(city.name)
-        if current_data and 'main' in current_data:
-            context['current_api_data'] = {
-                'temperature': current_data['main']['temp'],
-                'feels_like': current_data['main'].get('feels_like'),
-                'temp_min': current_data['main'].get('temp_min'),
-                'temp_max': current_data['main'].get('temp_max'),
-                'humidity': current_data['main']['humidity'],
-                'description': current_data['weather'][0]['description'].title(),
-                'main': current_data['weather'][0]['main'],
-                'wind_speed': current_data['wind']['speed'],
-                'wind_deg': current_data['wind'].get('deg'),
-                'wind_gust': current_data['wind'].get('gust'),
-                'pressure': current_data['main']['pressure'],
-                'cloudiness': current_data['clouds']['all'],
-                'visibility': current_data.get('visibility'),
-                'sunrise': current_data['sys'].get('sunrise'),
-                'sunset': current_data['sys'].get('sunset'),
-                'country': current_data['sys'].get('country'),
-            }
+        # AQI/UVI only need coordinates - use the stored ones when available
+        aqi_future = uvi_future = None
+        if city.latitude is not None and city.longitude is not None:
+            aqi_future = upstream_executor.submit(get_aqi_data, city.latitude, city.longitude)
+            uvi_future = upstream_executor.submit(get_uvi_data, city.latitude, city.longitude)
         
-        # Fetch 10-day forecast
-        forecast_data = get_forecast_data(city.name)
-        context['forecast_data'] = forecast_data
+        # Current weather from the stored observation or the API
+        current_data = current_future.result() if current_future else None
+        if current_future is None:
+            context['current_api_data'] = stored.as_dict()
+        elif current_data and 'main' in current_data:
+            record = record_weather(city, current_data)
+            context['current_api_data'] = latest_from_record(record).as_dict()
         
-        # Fetch hourly forecast (next 24 hours)
-        hourly_data = get_hourly_forecast(city.name)
-        context['hourly_forecast'] = hourly_data
+        # Coordinates only became known from the current weather response
+        if aqi_future is None and current_data and 'coord' in current_data:
+            lat, lon = current_data['coord']['lat'], current_data['coord']['lon']
+            aqi_future = upstream_executor.submit(get_aqi_data, lat, lon)
+            uvi_future = upstream_executor.submit(get_uvi_data, lat, lon)
         
-        # Fetch AQI data
-        if current_data:
-            aqi_data = get_aqi_data(current_data['coord']['lat'], current_data['coord']['lon'])
-            context['aqi_data'] = aqi_data
-            
-            # Fetch UV Index
-            uvi_data = get_uvi_data(current_data['coord']['lat'], current_data['coord']['lon'])
-            context['uvi_data'] = uvi_data
+        # Get weather history (last 10 records, including one just recorded);
+        # the newest is the latest weather
+        weather_history = list(city.weather_records.all()[:10])
+        context['weather_history'] = weather_history
+        context['latest_weather'] = weather_history[0] if weather_history else None
         
-        # Calculate historical stats for trend analysis
-        weather_records = city.weather_records.all()[:30]  # Last 30 records
-        if weather_records.exists():
-            temps = [r.temperature for r in weather_records]
+        # 10-day forecast and hourly forecast (next 24 hours) from one request
+        forecast = forecast_future.result()
+        context['forecast_data'] = forecast['daily']
+        context['hourly_forecast'] = forecast['hourly']
+        
+        # AQI and UV Index
+        if aqi_future is not None:
+            context['aqi_data'] = aqi_future.result()
+            context['uvi_data'] = uvi_future.result()
+        
+        # Historical stats for trend analysis from the hourly rollups
+        rollups = list(city.hourly_rollups.all()[:30])  # Last 30 hours with data
+        if rollups:
             context['temp_trend'] = {
-                'avg': sum(temps) / len(temps),
-                'min': min(temps),
-                'max': max(temps),
-                'temperatures': list(reversed([t for t in temps])),
+                'avg': sum(r.temp_sum for r in rollups) / sum(r.count for r in rollups),
+                'min': min(r.temp_min for r in rollups),
+                'max': max(r.temp_max for r in rollups),
+                'temperatures': [round(r.temp_mean, 1) for r in reversed(rollups)],
             }
         
         return context
 
 
-class CityListView(ListView):
+@method_decorator(conditional_on(city_list_validators), name='dispatch')
+class CityListView(KeysetPaginationMixin, ListView):
     """List all tracked cities"""
     model = City
     template_name = 'WEATHERAPP/city_list.html'
     context_object_name = 'cities'
     paginate_by = 10
+    keyset_ordering = ('name', 'id')
+    
+    def get_queryset(self):
+        """Cities with their latest observation joined in"""
+        return City.objects.select_related('latest_weather')
 
 
-class SearchHistoryView(ListView):
+class SearchHistoryView(KeysetPaginationMixin, ListView):
     """List all searched cities with their search timestamps"""
-    model = SearchHistory
+    model = City
     template_name = 'WEATHERAPP/search_history.html'
     context_object_name = 'search_records'
     paginate_by = 20
+    keyset_ordering = ('-last_searched_at', '-id')
     
     def get_queryset(self):
         """Get unique cities sorted by last search time"""
-        # Group by city and get the most recent search for each
-        return SearchHistory.objects.all().select_related('city')
+        return City.objects.filter(last_searched_at__isnull=False)
 
 
 @require_http_methods(["POST"])
@@ -359,27 +692,19 @@ def delete_city(request, pk):
 def refresh_weather(request, pk):
     """Refresh weather data for a city"""
     city = get_object_or_404(City, pk=pk)
-    data = get_weather_data(city.name)
+    data = get_weather_data(city, fresh=True)
     
     if data and 'main' in data:
-        # Update city info
-        city.latitude = data['coord']['lat']
-        city.longitude = data['coord']['lon']
+        # Update city info; stored coordinates are kept, they identify the
+        # city in later fetches
+        if city.latitude is None or city.longitude is None:
+            city.latitude = data['coord']['lat']
+            city.longitude = data['coord']['lon']
         city.country = data['sys'].get('country', '')
         city.save()
         
         # Create new weather record
-        WeatherData.objects.create(
-            city=city,
-            temperature=data['main']['temp'],
-            feels_like=data['main'].get('feels_like'),
-            humidity=data['main']['humidity'],
-            pressure=data['main']['pressure'],
-            weather_main=data['weather'][0]['main'],
-            weather_description=data['weather'][0]['description'],
-            wind_speed=data['wind']['speed'],
-            cloudiness=data['clouds']['all'],
-        )
+        record_weather(city, data)
         
         messages.success(request, f"Weather data for {city.name} updated!")
     else:
@@ -404,35 +729,55 @@ def toggle_favorite(request, city_id):
         return JsonResponse({'status': 'error', 'message': 'City not found'}, status=404)
 
 
+@conditional_on(hourly_data_validators)
 def get_hourly_data(request, city_id):
     """API endpoint to get hourly forecast for a city"""
     try:
         city = City.objects.get(id=city_id)
-        hourly_data = get_hourly_forecast(city.name)
+        hourly_data = get_forecast(city)['hourly']
         return JsonResponse({'hourly_forecast': hourly_data})
     except City.DoesNotExist:
         return JsonResponse({'status': 'error'}, status=404)
 
 
+@conditional_on(favorites_validators)
 def favorites_view(request):
     """View to show all favorite cities"""
-    favorites = Favorite.objects.select_related('city').all()
-    weather_data = {}
-    
-    for fav in favorites:
-        data = get_weather_data(fav.city.name)
-        if data and 'main' in data:
-            weather_data[fav.city.id] = {
-                'temperature': data['main']['temp'],
-                'feels_like': data['main'].get('feels_like'),
-                'humidity': data['main']['humidity'],
-                'description': data['weather'][0]['description'].title(),
-                'main': data['weather'][0]['main'],
-                'wind_speed': data['wind']['speed'],
-            }
+    favorites = Favorite.objects.select_related('city__latest_weather').all()
+    weather_data = get_current_weather(fav.city for fav in favorites)
     
     context = {
         'favorites': favorites,
         'weather_data': weather_data,
     }
     return render(request, 'WEATHERAPP/favorites.html', context)
+
+
+# Upper bound on cities per live update poll
+MAX_UPDATE_CITIES = 200
+
+
+@require_http_methods(["GET"])
+def weather_updates(request):
+    """
+    API endpoint for live updates: latest observations of the given cities
+    (?ids=1,2,3) that are newer than ?since=<unix timestamp>
+    """
+    try:
+        city_ids = [int(city_id) for city_id in request.GET.get('ids', '').split(',') if city_id][:MAX_UPDATE_CITIES]
+        since = datetime.fromtimestamp(float(request.GET.get('since', 0)), tz=dt_timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        return JsonResponse({'status': 'error', 'message': 'Invalid ids or since'}, status=400)
+    
+    updates = {}
+    latest = LatestWeather.objects.filter(city_id__in=city_ids, observed_at__gt=since).select_related('city')
+    for observation in latest:
+        weather = observation.as_dict()
+        weather['observed_at'] = weather['observed_at'].timestamp()
+        updates[observation.city_id] = weather
+    return JsonResponse({'updates': updates})
+
+
+def cache_stats_view(request):
+    """API endpoint exposing upstream cache hit/miss counters"""
+    return JsonResponse({'upstream_cache': cache_stats.snapshot()})
@@ -27,6 +27,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
     'WEATHERAPP',
 ]
 
@@ -89,6 +90,102 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Cache
+# The 'weather' cache holds OpenWeatherMap responses (see WEATHERAPP/cache.py)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'weather': {
+        'BACKEND': 'WEATHERAPP.cache.LRULocMemCache',
+        'LOCATION': 'owm-responses',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
+
+# TTL in seconds per upstream endpoint
+WEATHER_CACHE_TTLS = {
+    'weather': 10 * 60,
+    'forecast': 60 * 60,
+    'air_pollution': 30 * 60,
+    'uvi': 30 * 60,
+}
+
+
+# Coalescing of identical in-flight upstream requests. Enable SHARED_LOCKS
+# when the 'weather' cache is shared between workers (e.g. Redis/Memcached)
+WEATHER_SINGLE_FLIGHT = {
+    'SHARED_LOCKS': False,
+    'LOCK_TIMEOUT': 15,
+    'WAIT_TIMEOUT': 6,
+}
+
+
+# OpenWeatherMap API root; set the environment variable to the address of
+# `manage.py fake_owm` to benchmark against a local stand-in
+OPENWEATHERMAP_API_ROOT = os.environ.get(
+    'OPENWEATHERMAP_API_ROOT', 'https://api.openweathermap.org/data/2.5'
+)
+
+# Shared HTTP client for OpenWeatherMap (see WEATHERAPP/http_client.py)
+OPENWEATHERMAP_HTTP = {
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 5,
+    'POOL_MAXSIZE': 16,
+    # Retries apply to update_weather and the scheduler only; page views fail fast
+    'MAX_RETRIES': 2,
+    'BACKOFF_FACTOR': 0.3,
+    'RETRY_AFTER_MAX': 30,
+}
+
+
+# Age thresholds for stored observations: fresh ones are served as-is,
+# stale ones are served and refreshed in the background, older ones are
+# fetched synchronously
+WEATHER_FRESHNESS = {
+    'FRESH_SECONDS': 10 * 60,
+    'STALE_SECONDS': 60 * 60,
+}
+
+
+# Refresh cadence (seconds) used by `manage.py run_weather_scheduler`
+WEATHER_SCHEDULER = {
+    'FAVORITE_INTERVAL': 15 * 60,
+    'RECENT_INTERVAL': 30 * 60,
+    'DEFAULT_INTERVAL': 60 * 60,
+    'RECENT_WINDOW': 24 * 60 * 60,
+    'SYNC_INTERVAL': 5 * 60,
+}
+
+
+# Weather data retention in days per tier (None keeps forever),
+# enforced by `manage.py prune_weather`
+WEATHER_RETENTION_DAYS = {
+    'raw': 7,
+    'hourly': 90,
+    'daily': None,
+}
+
+
+# Search history is buffered in memory and written in batches
+# (see WEATHERAPP/searches.py)
+WEATHER_SEARCH_BUFFER = {
+    'MAX_EVENTS': 200,
+    'FLUSH_INTERVAL': 5,
+}
+
+
+# JSON API (WEATHERAPP/api.py) is read-only and public
+REST_FRAMEWORK = {
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny'],
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'UNAUTHENTICATED_USER': None,
+}
+
+
 # Internationalization
 
 LANGUAGE_CODE = 'en-us'